@@ -1,3 +1,5 @@
+import abc
+import collections
 import time
 
 '''Constraint Satisfaction Routines
@@ -29,9 +31,15 @@ import time
       for each variable in the constraint (in the same ORDER as the
       variables of the constraint were specified).
 
+      Constraints that have a simple arithmetic form (NotEqual,
+      Consecutive, Ratio2 and AllDifferent) are subclasses that check
+      values and find supports directly and store no tuples at all.
+
     C) Backtracking routine---takes propagator and CSP as arguments
        so that basic backtracking, forward-checking or GAC can be 
-       executed depending on the propagator used.
+       executed depending on the propagator used. It returns a
+       SearchStats object, and callbacks can be subscribed to follow
+       the search as it runs.
 
 '''
 
@@ -45,8 +53,10 @@ class Variable:
 
        The variable object offers two types of functionality to support
        search. 
-       (a) It has a current domain, implimented as a set of flags 
-           determining which domain values are "current", i.e., unpruned.
+       (a) It has a current domain, implimented as an integer bitmask
+           (bit i set <=> dom[i] is "current", i.e., unpruned), with a
+           precomputed value -> bit map so that membership, size,
+           pruning and first-value queries are O(1).
            - you can prune a value, and restore it.
            - you can obtain a list of values in the current domain, or count
              how many are still there
@@ -80,17 +90,35 @@ class Variable:
         string). Optionally specify the initial domain.
         '''
         self.name = name                #text name for variable
-        self.dom = list(domain)         #Make a copy of passed domain
-        self.curdom = [True] * len(domain)      #using list
+        self.dom = []                   #domain values, in order
+        self.bit = dict()               #value -> its bit in curmask
+        self.curmask = 0                #bit i set <=> dom[i] is current
         #for bt_search
         self.assignedValue = None
+        #object told about every domain/assignment change (see
+        #DomainBuckets), None if nobody is watching
+        self.watcher = None
+        self.add_domain_values(domain)
 
     def add_domain_values(self, values):
         '''Add additional domain values to the domain
            Removals not supported removals'''
         for val in values: 
+            b = 1 << len(self.dom)
             self.dom.append(val)
-            self.curdom.append(True)
+            self.bit[val] = b
+            self.curmask |= b
+
+    def reset_domain(self, values):
+        '''Replace the whole domain by values, unassigning the variable.
+           Only for reusing a variable in a new problem (see
+           kropki_template.py), never during search'''
+        self.dom = []
+        self.bit = dict()
+        self.curmask = 0
+        self.assignedValue = None
+        self.watcher = None
+        self.add_domain_values(values)
 
     def domain_size(self):
         '''Return the size of the (permanent) domain'''
@@ -106,46 +134,73 @@ class Variable:
 
     def prune_value(self, value):
         '''Remove value from CURRENT domain'''
-        self.curdom[self.value_index(value)] = False
+        self.curmask &= ~self.bit[value]
+        if self.watcher is not None:
+            self.watcher.domain_changed(self)
 
     def unprune_value(self, value):
         '''Restore value to CURRENT domain'''
-        self.curdom[self.value_index(value)] = True
+        self.curmask |= self.bit[value]
+        if self.watcher is not None:
+            self.watcher.domain_changed(self)
 
     def cur_domain(self):
         '''return list of values in CURRENT domain (if assigned 
            only assigned value is viewed as being in current domain)'''
-        vals = []
         if self.is_assigned():
-            vals.append(self.get_assigned_value())
-        else:
-            for i, val in enumerate(self.dom):
-                if self.curdom[i]:
-                    vals.append(val)
-        return vals
+            return [self.assignedValue]
+        return self.mask_values(self.curmask)
+
+    def cur_domain_mask(self):
+        '''return the CURRENT domain as a bitmask over the variable's
+           domain (bit i <=> dom[i]), without constructing a list. If
+           assigned only the assigned value's bit is set'''
+        if self.assignedValue is not None:
+            return self.bit[self.assignedValue]
+        return self.curmask
 
     def in_cur_domain(self, value):
         '''check if value is in CURRENT domain (without constructing list)
            if assigned only assigned value is viewed as being in current 
            domain'''
-        if not value in self.dom:
+        b = self.bit.get(value)
+        if b is None:
             return False
-        if self.is_assigned():
-            return value == self.get_assigned_value()
-        else:
-            return self.curdom[self.value_index(value)]
+        if self.assignedValue is not None:
+            return value == self.assignedValue
+        return self.curmask & b != 0
 
     def cur_domain_size(self):
         '''Return the size of the variables domain (without construcing list)'''
-        if self.is_assigned():
+        if self.assignedValue is not None:
             return 1
-        else:
-            return(sum(1 for v in self.curdom if v))
+        return self.curmask.bit_count()
+
+    def first_cur_value(self):
+        '''Return the first value (in domain order) of the CURRENT
+           domain, or None if the current domain is empty'''
+        if self.assignedValue is not None:
+            return self.assignedValue
+        m = self.curmask
+        if not m:
+            return None
+        return self.dom[(m & -m).bit_length() - 1]
+
+    def mask_values(self, mask):
+        '''Return the list of domain values whose bits are set in mask'''
+        vals = []
+        dom = self.dom
+        while mask:
+            low = mask & -mask
+            vals.append(dom[low.bit_length() - 1])
+            mask ^= low
+        return vals
 
     def restore_curdom(self):
         '''return all values back into CURRENT domain'''
-        for i in range(len(self.curdom)):
-            self.curdom[i] = True
+        self.curmask = (1 << len(self.dom)) - 1
+        if self.watcher is not None:
+            self.watcher.domain_changed(self)
 
     #
     #methods for assigning and unassigning
@@ -165,6 +220,8 @@ class Variable:
             return
 
         self.assignedValue = value
+        if self.watcher is not None:
+            self.watcher.assigned(self)
 
     def unassign(self):
         '''Used by bt_search. Unassign and restore old curdom'''
@@ -172,6 +229,8 @@ class Variable:
             print("ERROR: trying to unassign variable", self, " not yet assigned")
             return
         self.assignedValue = None
+        if self.watcher is not None:
+            self.watcher.unassigned(self)
 
     def get_assigned_value(self):
         '''return assigned value...returns None if is unassigned'''
@@ -184,7 +243,11 @@ class Variable:
     def value_index(self, value):
         '''Domain values need not be numbers, so return the index
            in the domain list of a variable value'''
-        return self.dom.index(value)
+        return self.bit[value].bit_length() - 1
+
+    #Trail undo hook (see class Trail): a variable's trail entries are
+    #pruned values, and undoing one puts the value back.
+    trail_undo = unprune_value
 
     def __repr__(self):
         return("Var-{}".format(self.name))
@@ -196,14 +259,14 @@ class Variable:
         '''Also print the variable domain and current domain'''
         print("Var--\"{}\": Dom = {}, CurDom = {}".format(self.name, 
                                                              self.dom, 
-                                                             self.curdom))
+                                                             self.mask_values(self.curmask)))
 class Constraint: 
     '''Class for defining constraints variable objects specifes an
        ordering over variables.  This ordering is used when calling
        the satisfied function which tests if an assignment to the
        variables in the constraint's scope satisfies the constraint'''
 
-    def __init__(self, name, scope): 
+    def __init__(self, name, scope, relation=None): 
         '''create a constraint object, specify the constraint name (a
         string) and its scope (an ORDERED list of variable objects).
         The order of the variables in the scope is critical to the
@@ -214,6 +277,11 @@ class Constraint:
         in the scope such that this sequence of values satisfies the
         constraints).
 
+        The tuples are held in a Relation, which can be given here and
+        shared by any number of constraints (see RelationRegistry), so
+        a table is stored once per distinct relation rather than once
+        per constraint.
+
         NOTE: This is a very space expensive representation...a proper
         constraint object would allow for representing the constraint
         with a function.  
@@ -221,32 +289,41 @@ class Constraint:
 
         self.scope = list(scope)
         self.name = name
-        self.sat_tuples = dict()
+        self.relation = relation
+        self.weight = 1         #1 + number of DWOs it caused (for dom/wdeg)
+        self.revisions = 0      #number of times a propagator revised it
+        self.residues = None    #per position: value -> index of last support
 
-        #The next object data item 'sup_tuples' will be used to help
-        #support GAC propgation. It allows access to a list of 
-        #satisfying tuples that contain a particular variable/value
-        #pair.
-        self.sup_tuples = dict()
+    @property
+    def sat_tuples(self):
+        '''dict whose keys are the satisfying tuples'''
+        return self.relation.tuples if self.relation is not None else dict()
 
     def add_satisfying_tuples(self, tuples):
         '''We specify the constraint by adding its complete list of satisfying tuples.'''
-        for x in tuples:
-            t = tuple(x)  #ensure we have an immutable tuple
-            if not t in self.sat_tuples:
-                self.sat_tuples[t] = True
-
-            #now put t in as a support for all of the variable values in it
-            for i, val in enumerate(t):
-                var = self.scope[i]
-                if not (var,val) in self.sup_tuples:
-                    self.sup_tuples[(var,val)] = []
-                self.sup_tuples[(var,val)].append(t)
+        if self.relation is None:
+            self.relation = Relation(self.name)
+        elif self.relation.frozen:
+            #never modify a shared relation, extend a private copy
+            self.relation = Relation(self.name, self.relation.tuples)
+        self.relation.add_tuples(tuples)
 
     def get_scope(self):
         '''get list of variables the constraint is over'''
         return list(self.scope)
 
+    def clone(self, scope):
+        '''Return a constraint of the same kind and name over scope (a
+           list of variables matching the scope of this one), sharing
+           this constraint's relation but none of its search state'''
+        c = self.__class__.__new__(self.__class__)
+        c.__dict__.update(self.__dict__)
+        c.scope = list(scope)
+        c.weight = 1
+        c.revisions = 0
+        c.residues = None
+        return c
+
     def check(self, vals):
         '''Given list of values, one for each variable in the
            constraints scope, return true if and only if these value
@@ -277,20 +354,58 @@ class Constraint:
         '''Test if a variable value pair has a supporting tuple (a set
            of assignments satisfying the constraint where each value is
            still in the corresponding variables current domain
+
+           The index of the last support found for each (position,
+           value) is remembered as a residue: it is re-checked first and
+           the scan resumes from it, wrapping around. A residue is only
+           a starting point, so it stays usable after backtracking and
+           needs no restoring.
         '''
-        if (var, val) in self.sup_tuples:
-            for t in self.sup_tuples[(var, val)]:
-                if self.tuple_is_valid(t):
-                    return True
+        if self.relation is None:
+            return False
+        pos = self.scope.index(var)
+        sups = self.relation.supports[pos].get(val)
+        if not sups:
+            return False
+        if self.residues is None:
+            self.residues = [dict() for _ in self.scope]
+        residues = self.residues[pos]
+        start = residues.get(val, 0)
+        n = len(sups)
+        for k in range(n):
+            i = start + k
+            if i >= n:
+                i -= n
+            if self.tuple_is_valid(sups[i]):
+                if i != start:
+                    residues[val] = i
+                return True
         return False
 
+    def revise(self, trail):
+        '''Prune every value of an unassigned scope variable that has no
+           support, recording the removals on trail (see class Trail).
+           Return the list of variables whose current domain shrank, or
+           None if some domain was wiped out. Constraints with a
+           dedicated filtering algorithm override this.'''
+        changed = []
+        for var in self.get_unasgn_vars():
+            pruned = False
+            for val in var.cur_domain():
+                if not self.has_support(var, val):
+                    trail.prune(var, val)
+                    pruned = True
+            if pruned:
+                if var.cur_domain_size() == 0:
+                    return None
+                changed.append(var)
+        return changed
+
     def tuple_is_valid(self, t):
         '''Internal routine. Check if every value in tuple is still in
            corresponding variable domains'''
-        # print(t)
-        for i, var in enumerate(self.scope):
-            # print("i", i, "var", var, "t[i]", t[i])
-            if not var.in_cur_domain(t[i]):
+        for var, val in zip(self.scope, t):
+            if not var.in_cur_domain(val):
                 return False
         return True
 
@@ -302,6 +417,395 @@ class Constraint:
 
 
 
+class Relation:
+    '''A table of satisfying tuples. Besides the tuples (the keys of the
+       dict 'tuples') it keeps 'supports': for every scope position i a
+       dict mapping a value to the list of tuples t with t[i] == value,
+       which is what GAC uses to look for supports. A relation says
+       nothing about which variables it constrains, so all constraints
+       with the same table can share one object. Once frozen (as
+       registry relations are) it must not be modified.'''
+
+    def __init__(self, name, tuples=()):
+        self.name = name
+        self.tuples = dict()
+        self.supports = []
+        self.frozen = False
+        self.add_tuples(tuples)
+
+    def add_tuples(self, tuples):
+        '''Add satisfying tuples (ignoring ones already present)'''
+        for x in tuples:
+            t = tuple(x)  #ensure we have an immutable tuple
+            if t in self.tuples:
+                continue
+            self.tuples[t] = True
+            while len(self.supports) < len(t):
+                self.supports.append(dict())
+            for i, val in enumerate(t):
+                sups = self.supports[i].get(val)
+                if sups is None:
+                    self.supports[i][val] = [t]
+                else:
+                    sups.append(t)
+
+    def __len__(self):
+        return len(self.tuples)
+
+
+class RelationRegistry:
+    '''Interning table of relations. Each distinct relation is built
+       once, under a hashable key, and the same frozen Relation object
+       is handed to every constraint that asks for that key.'''
+
+    def __init__(self):
+        self.relations = dict()
+
+    def get(self, key, tuples):
+        '''Return the relation registered under key. On first use it is
+           built from tuples(), a function returning the satisfying
+           tuples.'''
+        rel = self.relations.get(key)
+        if rel is None:
+            rel = Relation(str(key), tuples())
+            rel.frozen = True
+            rel = self.relations.setdefault(key, rel)
+        return rel
+
+    def adopt(self, key, rel):
+        '''Register rel, a relation built elsewhere (e.g. unpickled),
+           under key unless the key is already taken. Return the relation
+           now registered under key.'''
+        rel.frozen = True
+        return self.relations.setdefault(key, rel)
+
+    def key_of(self, rel):
+        '''Return the key rel is registered under, or None'''
+        for key, r in self.relations.items():
+            if r is rel:
+                return key
+        return None
+
+    def clear(self):
+        self.relations = dict()
+
+    def __len__(self):
+        return len(self.relations)
+
+
+#The process-wide registry used by the model builders
+RELATIONS = RelationRegistry()
+
+
+class BinaryConstraint(Constraint, metaclass=abc.ABCMeta):
+    '''Abstract base class for binary constraints defined by a relation
+       on values instead of a table of satisfying tuples. Subclasses
+       must give the relation (related) and may override has_support
+       with a direct arithmetic test; nothing is stored per tuple.'''
+
+    def __init__(self, name, scope):
+        Constraint.__init__(self, name, scope)
+        if len(self.scope) != 2:
+            print("Binary constraint ", name, " given scope of size ", len(self.scope))
+
+    @staticmethod
+    @abc.abstractmethod
+    def related(a, b):
+        '''Return True iff (a, b) satisfies the constraint'''
+
+    def other(self, var):
+        '''Return the scope variable that is not var'''
+        return self.scope[1] if var is self.scope[0] else self.scope[0]
+
+    def check(self, vals):
+        return self.related(vals[0], vals[1])
+
+    def has_support(self, var, val):
+        '''val is assumed to be in var's current domain (as it is when
+           called from the propagators)'''
+        other = self.other(var)
+        if var is self.scope[0]:
+            return any(self.related(val, w) for w in other.cur_domain())
+        return any(self.related(w, val) for w in other.cur_domain())
+
+    def print_all(self):
+        print("{}({})".format(self.name, [var.name for var in self.scope]))
+
+
+class NotEqual(BinaryConstraint):
+    '''scope[0] != scope[1]'''
+
+    @staticmethod
+    def related(a, b):
+        return a != b
+
+    def has_support(self, var, val):
+        other = self.other(var)
+        n = other.cur_domain_size()
+        return n > 1 or (n == 1 and not other.in_cur_domain(val))
+
+
+class Consecutive(BinaryConstraint):
+    '''|scope[0] - scope[1]| == 1 (a white Kropki dot)'''
+
+    @staticmethod
+    def related(a, b):
+        return a - b == 1 or b - a == 1
+
+    def has_support(self, var, val):
+        other = self.other(var)
+        return other.in_cur_domain(val - 1) or other.in_cur_domain(val + 1)
+
+
+class Ratio2(BinaryConstraint):
+    '''scope[0] == 2 * scope[1] or scope[1] == 2 * scope[0] (a black
+       Kropki dot)'''
+
+    @staticmethod
+    def related(a, b):
+        return a == 2 * b or b == 2 * a
+
+    def has_support(self, var, val):
+        other = self.other(var)
+        return (other.in_cur_domain(2 * val) or
+                (val % 2 == 0 and other.in_cur_domain(val // 2)))
+
+
+class NoDot(BinaryConstraint):
+    '''scope[0] and scope[1] are neither consecutive nor one twice the
+       other (neighbouring cells without a dot, under the standard rule
+       that every pair that could take a dot has one)'''
+
+    @staticmethod
+    def related(a, b):
+        return not (Consecutive.related(a, b) or Ratio2.related(a, b))
+
+    def has_support(self, var, val):
+        #at most 4 values of the other domain conflict with val
+        other = self.other(var)
+        n = other.cur_domain_size()
+        if n > 4:
+            return True
+        conflicts = {val - 1, val + 1, 2 * val}
+        if val % 2 == 0:
+            conflicts.add(val // 2)
+        return n > sum(1 for w in conflicts if other.in_cur_domain(w))
+
+
+class AllDifferent(Constraint):
+    '''N-ary constraint: all variables in the scope take distinct
+       values. No tuples are stored. revise() enforces GAC directly on
+       the current domains with Regin's matching algorithm: find a
+       maximum matching of variables to values, then keep exactly the
+       edges that lie in the matching, on an alternating path from a
+       free value, or inside a strongly connected component of the
+       variable/value graph. The last matching is kept as a starting
+       point for the next call.'''
+
+    def __init__(self, name, scope):
+        Constraint.__init__(self, name, scope)
+        self.matching = [None] * len(self.scope)   #hint: position -> value
+
+    def clone(self, scope):
+        c = Constraint.clone(self, scope)
+        c.matching = [None] * len(c.scope)
+        return c
+
+    def check(self, vals):
+        return len(set(vals)) == len(vals)
+
+    def has_support(self, var, val):
+        '''val is assumed to be in var's current domain'''
+        others = [v for v in self.scope if v is not var]
+        doms = []
+        for v in others:
+            d = v.cur_domain()
+            if val in d:
+                d.remove(val)
+            if not d:
+                return False
+            doms.append(d)
+        return len(max_matching(doms)) == len(doms)
+
+    def revise(self, trail):
+        scope = self.scope
+        n = len(scope)
+        doms = [var.cur_domain() for var in scope]
+
+        #maximum matching, seeded with the still valid part of the last one
+        owner = dict()
+        for i, val in enumerate(self.matching):
+            if val is not None and val not in owner and scope[i].in_cur_domain(val):
+                owner[val] = i
+        owner = max_matching(doms, owner)
+        if len(owner) < n:
+            return None
+        mate = [None] * n
+        for val, i in owner.items():
+            mate[i] = val
+        self.matching = mate
+
+        #graph: variable i -> mate[i] (matched edge), value v -> variable i
+        #for every other value v in doms[i]. Values are nodes ('v', value).
+        succ = dict()
+        for i in range(n):
+            succ[i] = [('v', mate[i])]
+            for val in doms[i]:
+                if val != mate[i]:
+                    succ.setdefault(('v', val), []).append(i)
+
+        #edges on an alternating path from a free value
+        reached = set()
+        stack = [('v', val) for i in range(n) for val in doms[i] if val not in owner]
+        while stack:
+            node = stack.pop()
+            if node not in reached:
+                reached.add(node)
+                stack.extend(succ.get(node, ()))
+
+        comp = strongly_connected_components(succ)
+
+        changed = []
+        for i, var in enumerate(scope):
+            if var.is_assigned():
+                continue
+            pruned = False
+            for val in doms[i]:
+                node = ('v', val)
+                if val != mate[i] and node not in reached and comp[node] != comp[i]:
+                    trail.prune(var, val)
+                    pruned = True
+            if pruned:
+                changed.append(var)
+        return changed
+
+    def print_all(self):
+        print("{}({})".format(self.name, [var.name for var in self.scope]))
+
+
+def max_matching(doms, owner=None):
+    '''Maximum matching of positions 0..n-1 to values, position i
+       allowed the values in doms[i]. owner is an optional partial
+       matching (value -> position) to start from. Returns a dict
+       value -> position (Kuhn's augmenting path algorithm).'''
+    owner = dict() if owner is None else owner
+    matched = set(owner.values())
+
+    def augment(i, seen):
+        for val in doms[i]:
+            if val not in seen:
+                seen.add(val)
+                j = owner.get(val)
+                if j is None or augment(j, seen):
+                    owner[val] = i
+                    return True
+        return False
+
+    for i in range(len(doms)):
+        if i not in matched:
+            augment(i, set())
+    return owner
+
+
+def strongly_connected_components(succ):
+    '''Tarjan's algorithm over the graph node -> list of successor
+       nodes (nodes without an entry have no successors). Returns a
+       dict node -> component number.'''
+    index = dict()
+    low = dict()
+    comp = dict()
+    stack = []
+    on_stack = set()
+    counter = [0, 0]   #next index, next component
+
+    def visit(node):
+        index[node] = low[node] = counter[0]
+        counter[0] += 1
+        stack.append(node)
+        on_stack.add(node)
+        for nxt in succ.get(node, ()):
+            if nxt not in index:
+                visit(nxt)
+                low[node] = min(low[node], low[nxt])
+            elif nxt in on_stack:
+                low[node] = min(low[node], index[nxt])
+        if low[node] == index[node]:
+            while True:
+                top = stack.pop()
+                on_stack.discard(top)
+                comp[top] = counter[1]
+                if top == node:
+                    break
+            counter[1] += 1
+
+    for node in list(succ):
+        if node not in index:
+            visit(node)
+    return comp
+
+
+class DomainBuckets:
+    '''Unassigned variables bucketed by current domain size, kept up to
+       date incrementally: the buckets become the watcher of each
+       variable, which reports every prune, unprune, restore, assign
+       and unassign. The MRV variable is then found in the first
+       non-empty bucket, without looking at the other variables (bucket
+       i is a dict used as a set).
+
+       A variable moves to the end of its bucket whenever its domain
+       changes, so the order inside a bucket depends on the search's
+       prune/unprune history. Ties are therefore broken by index, the
+       position of each variable in vars: the pick depends only on the
+       current domains.'''
+
+    def __init__(self, vars):
+        self.buckets = [dict() for _ in range(max([v.domain_size() for v in vars] + [0]) + 1)]
+        self.size = dict()   #var -> its bucket, None while assigned
+        self.index = dict((v, i) for i, v in enumerate(vars))
+        for v in vars:
+            v.watcher = self
+            self.size[v] = None
+            if not v.is_assigned():
+                self.unassigned(v)
+
+    def domain_changed(self, var):
+        old = self.size[var]
+        if old is None:
+            return
+        new = var.curmask.bit_count()
+        if new != old:
+            del self.buckets[old][var]
+            self.buckets[new][var] = True
+            self.size[var] = new
+
+    def assigned(self, var):
+        del self.buckets[self.size[var]][var]
+        self.size[var] = None
+
+    def unassigned(self, var):
+        n = var.curmask.bit_count()
+        self.buckets[n][var] = True
+        self.size[var] = n
+
+    def min_bucket(self):
+        '''Return the non-empty bucket of smallest domain size (a dict
+           whose keys are the variables), or None if all are assigned'''
+        for bucket in self.buckets:
+            if bucket:
+                return bucket
+        return None
+
+    def min_var(self):
+        '''Return the first (by index) unassigned variable of smallest
+           current domain'''
+        bucket = self.min_bucket()
+        if not bucket:
+            return None
+        if len(bucket) == 1:
+            return next(iter(bucket))
+        return min(bucket, key=self.index.__getitem__)
+
+
 class CSP:
     '''Class for packing up a set of variables into a CSP problem.
        Contains various utility routines for accessing the problem.
@@ -316,6 +820,13 @@ class CSP:
         self.vars = []
         self.cons = []
         self.vars_to_cons = dict()
+        self.domain_buckets = None
+        #lists of variables that take all different values (a Sudoku's
+        #rows, columns and boxes), for rule-based propagators; models
+        #record them with add_group. var_groups maps a variable to the
+        #indices of its groups
+        self.groups = []
+        self.var_groups = dict()
         for v in vars:
             self.add_var(v)
 
@@ -330,10 +841,20 @@ class CSP:
             self.vars.append(v)
             self.vars_to_cons[v] = []
 
+    def add_group(self, vars):
+        '''Record a group of CSP variables that take all different values'''
+        for v in vars:
+            if v not in self.vars_to_cons:
+                print("Trying to add group with variable ", v, " not in CSP object")
+                return
+        for v in vars:
+            self.var_groups.setdefault(v, []).append(len(self.groups))
+        self.groups.append(list(vars))
+
     def add_constraint(self,c):
         '''Add constraint to CSP. Note that all variables in the 
            constraints scope must already have been added to the CSP'''
-        if not type(c) is Constraint:
+        if not isinstance(c, Constraint):
             print("Trying to add non constraint ", c, " to CSP object")
         else:
             for v in c.scope:
@@ -351,6 +872,13 @@ class CSP:
         '''return list of constraints that include var in their scope'''
         return list(self.vars_to_cons[var])
 
+    def get_domain_buckets(self):
+        '''return the DomainBuckets of this CSP's variables, creating it
+           (and making it the watcher of every variable) on first use'''
+        if self.domain_buckets is None:
+            self.domain_buckets = DomainBuckets(self.vars)
+        return self.domain_buckets
+
     def get_all_unasgn_vars(self):
         '''return list of unassigned variables in the CSP'''
         return [v for v in self.vars if not v.is_assigned()]
@@ -374,10 +902,398 @@ class CSP:
             print(v, " = ", v.get_assigned_value(), "    ", end='')
         print("")
 
+########################################################
+# Trail                                                #
+########################################################
+
+class Trail:
+    '''Undo stack of the changes made to the search state below the
+       current choice point.
+
+       Propagators call prune(var, val) instead of var.prune_value(val)
+       and the removal is pushed onto the trail. The search takes a
+       marker (mark()) before each decision and, on backtracking, pops
+       everything above it with undo(marker).
+
+       Entries are stored flat as owner, item, owner, item ... so that
+       recording a pruning does not allocate a tuple. Undoing an entry
+       calls owner.trail_undo(item); for a Variable that unprunes the
+       value, but any object with a trail_undo method can put its own
+       reversible state on the trail with push().'''
+
+    def __init__(self):
+        self.stack = []
+        self.nPrunings = 0   #number of prune() calls since clear()
+        #the variables the running propagator is filtering on (a
+        #constraint's scope), set by the propagators for ExplainingTrail;
+        #None if unknown
+        self.culprit = None
+
+    def clear(self):
+        '''Forget all entries (without undoing them) and reset counters'''
+        self.stack = []
+        self.nPrunings = 0
+
+    def mark(self):
+        '''Return a choice-point marker for undo()'''
+        return len(self.stack)
+
+    def prune(self, var, value):
+        '''Prune value from var's current domain and record it'''
+        var.prune_value(value)
+        self.stack.append(var)
+        self.stack.append(value)
+        self.nPrunings += 1
+
+    def record(self, prunings):
+        '''Record a list of (Variable, Value) pairs that have already
+           been pruned (used for propagators that return prunings)'''
+        stack = self.stack
+        for var, val in prunings:
+            stack.append(var)
+            stack.append(val)
+        self.nPrunings += len(prunings)
+
+    def push(self, owner, item):
+        '''Record a generic entry: undo() will call owner.trail_undo(item)'''
+        self.stack.append(owner)
+        self.stack.append(item)
+
+    def undo(self, mark):
+        '''Undo every entry recorded after mark, most recent first'''
+        stack = self.stack
+        pop = stack.pop
+        for _ in range((len(stack) - mark) >> 1):
+            item = pop()
+            pop().trail_undo(item)
+
+    def prunings_since(self, mark):
+        '''Return the (Variable, Value) pairs pruned after mark'''
+        stack = self.stack
+        return [(stack[i], stack[i + 1]) for i in range(mark, len(stack), 2)
+                if isinstance(stack[i], Variable)]
+
+    def __len__(self):
+        '''Number of entries on the trail'''
+        return len(self.stack) >> 1
+
+
+class ExplainingTrail(Trail):
+    '''Trail that also explains every variable's current domain, for
+       conflict-directed backjumping. An explanation is a bitmask of
+       decision levels (bit d for the decision at depth d): the
+       decisions whose assignments led to the variable's prunings.
+
+       A pruning is explained by the variables of trail.culprit, the
+       scope the propagator was filtering when it pruned (the
+       propagators of propagators.py set it before each constraint they
+       revise): the level of each one that is a decision, the
+       explanation of each other one. With no culprit (a propagator that
+       does not set it, or prunings returned as a list) every decision
+       made so far is blamed, which is always safe. Explanations are
+       kept per variable rather than per value, and are undone along
+       with the prunings.'''
+
+    def __init__(self):
+        Trail.__init__(self)
+        self.reasons = dict()   #variable -> explanation of its prunings
+        self.levels = dict()    #decision variable -> its level bit
+        self.all_levels = 0     #the level bits of every decision
+
+    def clear(self):
+        Trail.clear(self)
+        self.reasons = dict()
+        self.levels = dict()
+        self.all_levels = 0
+
+    def decide(self, var, depth):
+        '''var was just assigned by the decision at depth'''
+        bit = 1 << depth
+        self.levels[var] = bit
+        self.all_levels |= bit
+
+    def undecide(self, var):
+        self.all_levels &= ~self.levels.pop(var)
+
+    def explain(self, scope, var=None):
+        '''The levels behind the current domains of the variables of
+           scope other than var (every level if scope is None)'''
+        if scope is None:
+            return self.all_levels
+        levels = self.levels
+        reasons = self.reasons
+        why = 0
+        for z in scope:
+            if z is not var:
+                why |= levels.get(z) or reasons.get(z, 0)
+        return why
+
+    def conflict(self):
+        '''The levels to blame for the failure of the last propagator call'''
+        return self.explain(self.culprit)
+
+    def blame(self, var, why):
+        '''Add the levels why to var's explanation'''
+        old = self.reasons.get(var, 0)
+        if why | old != old:
+            self.stack.append(self)
+            self.stack.append((var, old))
+            self.reasons[var] = why | old
+
+    def trail_undo(self, item):
+        var, old = item
+        self.reasons[var] = old
+
+    def prune(self, var, value):
+        self.blame(var, self.explain(self.culprit, var))
+        Trail.prune(self, var, value)
+
+    def record(self, prunings):
+        for var, _ in prunings:
+            self.blame(var, self.all_levels)
+        Trail.record(self, prunings)
+
+
+class NogoodStore:
+    '''Nogoods learned by backjumping search (bt_search(..., cbj=True,
+       nogoods=store)): sets of (variable, value) decisions that no
+       solution contains. The search skips a value that would complete
+       a nogood, without assigning or propagating it.
+
+       At most maxsize nogoods are kept; when the store is full, the
+       nogood least recently learned or used is evicted. Nogoods of more
+       than max_length decisions (None: no bound) are rarely complete
+       and not kept. Nogoods follow from the constraints and domains of
+       the CSP they were learned on, so a store can be kept across
+       searches of that CSP, but not reused after its domains change
+       (e.g. a template model reset for another board).'''
+
+    def __init__(self, maxsize=1000, max_length=10):
+        self.maxsize = maxsize
+        self.max_length = max_length
+        self.nogoods = collections.OrderedDict()  #frozenset of decisions, oldest first
+        self.watch = dict()     #decision -> set of the nogoods holding it
+        self.learned = 0
+        self.evicted = 0
+        self.hits = 0
+
+    def add(self, decisions):
+        '''Learn the nogood made of the (variable, value) pairs decisions'''
+        if self.max_length is not None and len(decisions) > self.max_length:
+            return
+        nogood = frozenset(decisions)
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        self.nogoods[nogood] = None
+        for d in nogood:
+            self.watch.setdefault(d, set()).add(nogood)
+        self.learned += 1
+        if len(self.nogoods) > self.maxsize:
+            old, _ = self.nogoods.popitem(last=False)
+            for d in old:
+                watching = self.watch[d]
+                watching.discard(old)
+                if not watching:
+                    del self.watch[d]
+            self.evicted += 1
+
+    def blocks(self, var, val, levels):
+        '''If assigning var = val would complete a nogood, return the level
+           bits (from levels, decision variable -> level bit) of its other
+           decisions; otherwise None'''
+        for nogood in self.watch.get((var, val), ()):
+            why = 0
+            for z, w in nogood:
+                if z is var:
+                    continue
+                if z.get_assigned_value() != w:
+                    break
+                why |= levels.get(z, 0)
+            else:
+                self.nogoods.move_to_end(nogood)
+                self.hits += 1
+                return why
+        return None
+
+    def __len__(self):
+        return len(self.nogoods)
+
 ########################################################
 # Backtracking Routine                                 #
 ########################################################
 
+class CancelToken:
+    '''Flag for asking a running search to stop (see SearchLimits).
+       Call cancel() from another thread, e.g. a scheduler or a signal
+       handler. Any object with an is_set() method (threading.Event,
+       multiprocessing.Event) can be used in its place, the latter to
+       cancel a search running in another process.'''
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def is_set(self):
+        return self.cancelled
+
+
+class SearchLimits:
+    '''Budget for one bt_search. Each limit is None (no limit) or:
+       wall_time   === seconds of wall clock time
+       cpu_time    === seconds of CPU time
+       decisions   === number of variable assignments
+       trail_size  === number of entries on the trail (prunings and other
+                       undo records held at once), a bound on memory use
+       cancel      === a CancelToken (or Event) that stops the search once set
+       The search stops at the first limit reached, with status None
+       (unknown) and SearchStats.limit naming the limit. The decision
+       limit is exact; the others are checked every check_every
+       decisions, and never in the middle of a propagator call.'''
+
+    def __init__(self, wall_time=None, cpu_time=None, decisions=None, trail_size=None,
+                 cancel=None, check_every=64):
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.decisions = decisions
+        self.trail_size = trail_size
+        self.cancel = cancel
+        self.check_every = check_every
+
+    def reached(self, bt):
+        '''Return the name of a limit that the search of bt has reached,
+           or None'''
+        if self.cancel is not None and self.cancel.is_set():
+            return 'cancelled'
+        if self.decisions is not None and bt.nDecisions >= self.decisions:
+            return 'decisions'
+        if self.trail_size is not None and len(bt.trail) >= self.trail_size:
+            return 'trail_size'
+        if self.wall_time is not None and time.perf_counter() - bt.wallStart >= self.wall_time:
+            return 'wall_time'
+        if self.cpu_time is not None and time.process_time() - bt.cpuStart >= self.cpu_time:
+            return 'cpu_time'
+        return None
+
+    def next_check(self, decisions):
+        '''Return the decision count at which to check the limits next'''
+        check = decisions + self.check_every
+        if self.decisions is not None and self.decisions < check:
+            check = self.decisions
+        return check
+
+
+class RootSAC:
+    '''Failed-value probing (singleton arc consistency) run at the root
+       by bt_search(..., sac=RootSAC(...)) before the first decision:
+       every value left in a domain is tried on its own with propagator,
+       and the values whose propagation fails are pruned for the whole
+       search. A pruning can make values that were probed before fail
+       now, so the variables sharing a constraint with a domain that
+       shrank are probed again, until nothing changes or a budget runs
+       out:
+       propagator  === the propagator of the probes (None: the search's)
+       time        === seconds of wall clock time for the probing
+       probes      === number of values probed
+       Without budgets the root ends up singleton arc consistent (for
+       that propagator's notion of consistency); with them the search
+       starts from whatever was pruned when the budget ran out.'''
+
+    def __init__(self, propagator=None, time=None, probes=None):
+        self.propagator = propagator
+        self.time = time
+        self.probes = probes
+
+    def spent(self, probes, start):
+        '''True once probes probes made since the wall clock time start
+           use up a budget'''
+        if self.probes is not None and probes >= self.probes:
+            return True
+        return self.time is not None and time.perf_counter() - start >= self.time
+
+
+class SearchStats:
+    '''What a bt_search found and what it took:
+       status        === True if a solution was found, False if there is
+                         none, None if a limit stopped the search first
+                         (the object itself is true iff status is True)
+       limit         === name of the SearchLimits limit that stopped the
+                         search, or None
+       solution      === dict Variable -> value of the solution the
+                         variables are left assigned to, or None (an
+                         enumeration, iter_solutions or count_solutions,
+                         leaves none)
+       solutions     === number of solutions found
+       decisions     === number of variable assignments
+       prunings      === number of values pruned
+       backtracks    === number of choice points that ran out of values
+       max_depth     === largest number of variables assigned at once
+       propagations  === number of propagator calls (root included)
+       prop_time     === seconds spent in the propagator
+       search_time   === seconds spent in the whole search
+       branch_time   === search_time - prop_time: choosing variables and
+                         values, assigning and undoing
+       runtime       === CPU seconds of the whole search
+       revisions     === dict constraint class name -> number of times
+                         constraints of that class were revised
+       probes        === number of values probed at the root (see RootSAC)
+       probe_prunings === number of values the probes refuted
+       probe_time    === seconds spent probing
+       backjumps     === number of choice points a backjumping search
+                         (bt_search(..., cbj=True)) jumped over
+       nogood_prunings === number of values skipped because they would
+                         complete a learned nogood
+       (times other than runtime are wall clock seconds)
+    '''
+
+    def __init__(self, status, solution, decisions, prunings, backtracks, max_depth,
+                 propagations, prop_time, search_time, runtime, revisions, limit=None,
+                 solutions=0, probes=0, probe_prunings=0, probe_time=0, backjumps=0,
+                 nogood_prunings=0):
+        self.status = status
+        self.limit = limit
+        self.solutions = solutions
+        self.solution = solution
+        self.decisions = decisions
+        self.prunings = prunings
+        self.backtracks = backtracks
+        self.max_depth = max_depth
+        self.propagations = propagations
+        self.prop_time = prop_time
+        self.search_time = search_time
+        self.runtime = runtime
+        self.revisions = revisions
+        self.probes = probes
+        self.probe_prunings = probe_prunings
+        self.probe_time = probe_time
+        self.backjumps = backjumps
+        self.nogood_prunings = nogood_prunings
+
+    @property
+    def branch_time(self):
+        return self.search_time - self.prop_time
+
+    def __bool__(self):
+        return self.status is True
+
+    def as_dict(self):
+        '''The stats as a dict of plain values (the solution keyed by
+           variable name), e.g. for JSON'''
+        d = dict(self.__dict__)
+        d['branch_time'] = self.branch_time
+        if self.solution is not None:
+            d['solution'] = dict((var.name, val) for var, val in self.solution.items())
+        return d
+
+    def __repr__(self):
+        return ("SearchStats(status={}, limit={}, decisions={}, prunings={}, backtracks={}, "
+                "max_depth={}, propagations={}, prop_time={:.4f}, search_time={:.4f})").format(
+                    self.status, self.limit, self.decisions, self.prunings, self.backtracks,
+                    self.max_depth, self.propagations, self.prop_time, self.search_time)
+
+
 class BT:
     '''use a class to encapsulate things like statistics
        and bookeeping for pruning/unpruning variabel domains
@@ -385,7 +1301,26 @@ class BT:
        passing the CSP as a parameter. Then you can invoke
        that objects's bt_search routine with the right
        kind or propagator function to obtain plain backtracking
-       forward-checking or gac'''
+       forward-checking or gac
+
+       Prunings are kept on a solver-owned Trail. Propagators that
+       support it (those with a true 'uses_trail' attribute, see
+       propagators.py) are called as propagator(csp, var, trail) and
+       push their removals straight onto it; any other propagator is
+       called as propagator(csp, var) and the (Variable, Value) list it
+       returns is recorded on the trail for it.
+
+       bt_search returns a SearchStats. To follow the search as it runs,
+       subscribe a callback to one of the EVENTS:
+           'decision'    callback(var, val, depth)   var was assigned val
+           'propagated'  callback(var, status)       after each propagator
+                                                     call (var is None at
+                                                     the root)
+           'backtrack'   callback(var, depth)        var ran out of values
+           'finish'      callback(stats)             the search is over
+       An event nobody subscribed to costs one test of an empty list.'''
+
+    EVENTS = ('decision', 'propagated', 'backtrack', 'finish')
 
     def __init__(self, csp):
         '''csp == CSP object specifying the CSP to be solved'''
@@ -394,9 +1329,23 @@ class BT:
         self.nDecisions = 0 #nDecisions is the number of variable 
                             #assignments made during search
         self.nPrunings  = 0 #nPrunings is the number of value prunings during search
-        unasgn_vars = list() #used to track unassigned variables
+        self.unasgn_vars = list() #used to track unassigned variables
+        self.trail = Trail() #undo stack of prunings made during search
         self.TRACE = False
-        self.runtime = 0
+        self.VERBOSE = True  #print the outcome, solution and stats
+        self.hooks = dict((event, []) for event in BT.EVENTS)
+        self.clear_stats()
+
+    def subscribe(self, event, callback):
+        '''Call callback on every event (one of BT.EVENTS) of the search'''
+        if event not in self.hooks:
+            print("Trying to subscribe to unknown search event", event)
+            return
+        self.hooks[event].append(callback)
+
+    def unsubscribe(self, event, callback):
+        if callback in self.hooks.get(event, []):
+            self.hooks[event].remove(callback)
 
     def trace_on(self):
         '''Turn search trace on'''
@@ -406,23 +1355,46 @@ class BT:
         '''Turn search trace off'''
         self.TRACE = False
 
+    def verbose_on(self):
+        '''Print the search outcome, solution and stats'''
+        self.VERBOSE = True
+
+    def verbose_off(self):
+        '''Search silently (bt_search only returns its result)'''
+        self.VERBOSE = False
+
         
     def clear_stats(self):
         '''Initialize counters'''
         self.nDecisions = 0
         self.nPrunings = 0
+        self.nBacktracks = 0
+        self.nPropagations = 0
+        self.maxDepth = 0
+        self.propTime = 0
+        self.searchTime = 0
         self.runtime = 0
+        self.limit = None
+        self.nSolutions = 0
+        self.nProbes = 0
+        self.nProbePrunings = 0
+        self.probeTime = 0
+        self.nBackjumps = 0
+        self.nNogoodPrunings = 0
+        self.stats = None
 
     def print_stats(self):
         print("Search made {} variable assignments and pruned {} variable values".format(
             self.nDecisions, self.nPrunings))
+        if self.runtime > 0:
+            print("{:.0f} decisions per second".format(self.nDecisions / self.runtime))
 
     def restoreValues(self,prunings):
         '''Restore list of values to variable domains
            each item in prunings is a pair (var, val)'''
         for var, val in prunings:
             var.unprune_value(val)
-            # print(var.cur_domain())
+
     def restore_all_variable_domains(self):
         '''Reinitialize all variable domains'''
         for var in self.csp.vars:
@@ -430,101 +1402,471 @@ class BT:
                 var.unassign()
             var.restore_curdom()
 
+    def take_unasgn_var(self, var):
+        '''Remove var from the set of unassigned variables in O(1): swap
+           it to the front of the unassigned part of unasgn_vars and move
+           the boundary past it'''
+        vars = self.unasgn_vars
+        pos = self.unasgn_pos
+        i = pos[var]
+        j = self.unasgn_start
+        other = vars[j]
+        vars[i] = other
+        pos[other] = i
+        vars[j] = var
+        pos[var] = j
+        self.unasgn_start = j + 1
+
     def restoreUnasgnVar(self, var):
-        '''Add variable back to list of unassigned vars'''
-        self.unasgn_vars.append(var)
+        '''Add variable back to the set of unassigned vars. Variables must
+           be restored in the reverse order they were taken'''
+        self.unasgn_start -= 1
+
+    def propagate(self, propagator, var=None):
+        '''Run propagator after var was assigned (or at the root when var
+           is None), recording its prunings on the trail. Return the
+           propagator status'''
+        start = time.perf_counter()
+        self.trail.culprit = None
+        if getattr(propagator, 'uses_trail', False):
+            status, _ = propagator(self.csp, var, self.trail)
+        else:
+            status, prunings = propagator(self.csp, var)
+            self.trail.record(prunings)
+        self.propTime += time.perf_counter() - start
+        self.nPropagations += 1
+        if self.hooks['propagated']:
+            for callback in self.hooks['propagated']:
+                callback(var, status)
+        return status
         
-    def bt_search(self,propagator,var_ord=None,val_ord=None):
-        '''Return true if found solution. False if still need to search.
-           If top level returns false--> no solution'''
-
+    def bt_search(self,propagator,var_ord=None,val_ord=None,limits=None,sac=None,
+                  cbj=False,nogoods=None):
+        '''Search for a solution and return a SearchStats, which is true
+           if a solution was found (the variables are then left assigned
+           to it) and false if there is no solution or the search was
+           stopped by limits (a SearchLimits) first. With sac (a RootSAC)
+           the root is strengthened by failed-value probing first.
+
+           With cbj the search backjumps: when a variable runs out of
+           values it goes straight back to the latest decision to blame
+           for it (see search_solutions_cbj) instead of the previous one.
+           With nogoods (a NogoodStore, implies cbj) the search also
+           learns the sets of decisions it found to be dead ends, and
+           skips values that would repeat one. Either way it only skips
+           subtrees without solutions, so it finds the same first
+           solution as plain backtracking when var_ord and val_ord
+           depend on the current domains alone (the default orders,
+           ord_mrv, ord_dom_deg). Orderings with a history do not:
+           ord_dom_wdeg weighs constraints by the failures seen, and
+           val_random draws from a generator at every choice point, so
+           they see fewer failures and choice points than under plain
+           backtracking and may lead to another solution of a board
+           that has several.'''
+        cbj = cbj or nogoods is not None
+        status = self.start_search(propagator, limits, sac=sac, explain=cbj, val_ord=val_ord)
+        if status and cbj:
+            status = self.bt_backjump(propagator, var_ord, val_ord, limits, nogoods)
+        elif status:
+            status = self.bt_iterate(propagator, var_ord, val_ord, limits)   #now do the search
+        if status:
+            self.nSolutions = 1
+        return self.finish_search(status)
+
+    def iter_solutions(self, propagator, var_ord=None, val_ord=None, limits=None):
+        '''Generator yielding every solution in turn, as a dict Variable
+           -> value. The search resumes where it left off when the next
+           solution is asked for, so nothing is rebuilt between solutions.
+           Once the generator is exhausted (or closed) self.stats holds
+           the SearchStats of the enumeration: status True if there was
+           a solution, None if limits stopped it, and solutions the
+           number found. Nothing is printed.'''
+        status = self.start_search(propagator, limits, False, val_ord=val_ord)
+        try:
+            if status:
+                for _ in self.search_solutions(propagator, var_ord, val_ord, limits):
+                    self.nSolutions += 1
+                    yield dict((var, var.get_assigned_value()) for var in self.csp.vars)
+        finally:
+            #also when the caller stops early (closes the generator)
+            if status:
+                status = None if self.limit is not None else self.nSolutions > 0
+            self.finish_search(status, False, False)
+
+    def count_solutions(self, propagator, var_ord=None, val_ord=None, limit=2, limits=None):
+        '''Count the solutions, stopping as soon as limit of them (None
+           for no limit) have been found, and return the count. With the
+           default limit, a result of 1 means the solution is unique.
+           self.stats holds the SearchStats as for iter_solutions.'''
+        status = self.start_search(propagator, limits, False, val_ord=val_ord)
+        if status:
+            for _ in self.search_solutions(propagator, var_ord, val_ord, limits):
+                self.nSolutions += 1
+                if limit is not None and self.nSolutions >= limit:
+                    break
+            status = None if self.limit is not None else self.nSolutions > 0
+        self.finish_search(status, False, False)
+        return self.nSolutions
+
+    def start_search(self, propagator, limits=None, report=True, sac=None, explain=False,
+                     val_ord=None):
+        '''Reset the statistics and the search state and run the root
+           propagation (and probing, with sac). With explain the search
+           runs on an ExplainingTrail (needed by search_solutions_cbj).
+           A val_ord with a reset method (e.g. val_random) is reset.
+           Return the root status (None if limits were already reached)'''
         self.clear_stats()
-        stime = time.process_time()
+        if hasattr(val_ord, 'reset'):
+            val_ord.reset()
+        self.cpuStart = time.process_time()
+        self.wallStart = time.perf_counter()
 
         self.restore_all_variable_domains()
-        
-        self.unasgn_vars = []
-        for v in self.csp.vars:
-            if not v.is_assigned():
-                self.unasgn_vars.append(v)
-
-        status, prunings = propagator(self.csp) #initial propagate no assigned variables.
-        self.nPrunings = self.nPrunings + len(prunings)
-        # print("before", prunings)
+        if explain != isinstance(self.trail, ExplainingTrail):
+            self.trail = ExplainingTrail() if explain else Trail()
+        self.trail.clear()
+        for c in self.csp.cons:
+            c.weight = 1
+            c.revisions = 0
+
+        #sparse set of unassigned variables: unasgn_vars[unasgn_start:]
+        #are unassigned, the assigned ones sit before the boundary
+        self.unasgn_vars = [v for v in self.csp.vars if not v.is_assigned()]
+        self.unasgn_pos = dict((v, i) for i, v in enumerate(self.unasgn_vars))
+        self.unasgn_start = 0
+
+        status = self.propagate(propagator) #initial propagate no assigned variables.
+        if status and sac is not None:
+            status = self.probe_root(propagator, sac)
         if self.TRACE:
             print(len(self.unasgn_vars), " unassigned variables at start of search")
-            print("Root Prunings: ", prunings)
+            print("Root Prunings: ", self.trail.prunings_since(0))
 
         if status == False:
-            print("CSP{} detected contradiction at root".format(
-                self.csp.name))
-        else:
-            status = self.bt_recurse(propagator, var_ord, val_ord, 1)   #now do recursive search
-
-        # print("111111", prunings)
-        self.restoreValues(prunings)
-        if status == False:
-            print("CSP{} unsolved. Has no solutions".format(self.csp.name))
-        if status == True:
-            print("CSP {} solved. CPU Time used = {}".format(self.csp.name,
-                                                             time.process_time() - stime))
-            self.csp.print_soln()
-
-        print("bt_search finished")
-        self.print_stats()
-
-    def bt_recurse(self, propagator, var_ord, val_ord, level):
-        '''Return true if found solution. False if still need to search.
-           If top level returns false--> no solution'''
-
+            if self.VERBOSE and report:
+                print("CSP{} detected contradiction at root".format(
+                    self.csp.name))
+        elif limits is not None:
+            self.limit = limits.reached(self)
+            if self.limit is not None:
+                status = None
+        return status
+
+    def probe_root(self, propagator, sac):
+        '''Failed-value probing at the root, within the budgets of sac (a
+           RootSAC). Refuted values are pruned on the trail below every
+           decision, so they stay pruned for the whole search. Return
+           False if the probing proved that there is no solution'''
+        start = time.perf_counter()
+        prop = sac.propagator or propagator
+        trail = self.trail
+        vars_to_cons = self.csp.vars_to_cons
+        queue = collections.deque(v for v in self.csp.vars if not v.is_assigned())
+        queued = set(queue)
+        status = True
+        while queue and status:
+            var = queue.popleft()
+            queued.discard(var)
+            if var.cur_domain_size() < 2:
+                continue
+            for val in var.cur_domain():
+                if sac.spent(self.nProbes, start):
+                    queue.clear()
+                    break
+                if not var.in_cur_domain(val):
+                    continue    #pruned by an earlier refutation
+                mark = trail.mark()
+                var.assign(val)
+                self.nProbes += 1
+                refuted = not self.propagate(prop, var)
+                trail.undo(mark)
+                var.unassign()
+                if not refuted:
+                    continue
+                self.nProbePrunings += 1
+                trail.prune(var, val)
+                if not self.propagate(prop, var):
+                    status = False
+                    break
+                #probe again whatever is next to a domain that shrank
+                for w in set(v for v, _ in trail.prunings_since(mark)):
+                    for c in vars_to_cons[w]:
+                        for z in c.scope:
+                            if z not in queued and not z.is_assigned():
+                                queued.add(z)
+                                queue.append(z)
+        self.probeTime = time.perf_counter() - start
         if self.TRACE:
-            print('  ' * level, "bt_recurse level ", level)
-           
-        if not self.unasgn_vars:
-            #all variables assigned
-            return True
+            print("Root probing: {} probes, {} values refuted".format(
+                self.nProbes, self.nProbePrunings))
+        return status
+
+    def finish_search(self, status, report=True, keep=True):
+        '''Undo the search's prunings, make the SearchStats of the search
+           and report it (to the 'finish' callbacks, and if verbose and
+           report, on the screen). Return the stats. The variables the
+           search assigned are left assigned if keep (bt_search leaves
+           its solution that way) and unassigned otherwise, as when an
+           enumeration stops early'''
+        self.runtime = time.process_time() - self.cpuStart
+        self.searchTime = time.perf_counter() - self.wallStart
+        self.nPrunings = self.trail.nPrunings
+        if not keep:
+            for var in self.unasgn_vars[:self.unasgn_start]:
+                if var.is_assigned():
+                    var.unassign()
+            self.unasgn_start = 0
+        self.trail.undo(0)
+        self.stats = self.make_stats(status)
+        for callback in self.hooks['finish']:
+            callback(self.stats)
+        if self.VERBOSE and report:
+            if status == False:
+                print("CSP{} unsolved. Has no solutions".format(self.csp.name))
+            if status == True:
+                print("CSP {} solved. CPU Time used = {}".format(self.csp.name,
+                                                                 self.runtime))
+                self.csp.print_soln()
+            if status is None:
+                print("CSP {} search stopped: {} limit reached".format(self.csp.name,
+                                                                      self.limit))
+
+            print("bt_search finished")
+            self.print_stats()
+        return self.stats
+
+    def make_stats(self, status):
+        '''Return the SearchStats of the search that just ended'''
+        solution = None
+        if status is True and all(var.is_assigned() for var in self.csp.vars):
+            solution = dict((var, var.get_assigned_value()) for var in self.csp.vars)
+        revisions = dict()
+        for c in self.csp.cons:
+            if c.revisions:
+                kind = type(c).__name__
+                revisions[kind] = revisions.get(kind, 0) + c.revisions
+        return SearchStats(status, solution, self.nDecisions, self.nPrunings,
+                           self.nBacktracks, self.maxDepth, self.nPropagations,
+                           self.propTime, self.searchTime, self.runtime, revisions,
+                           self.limit, self.nSolutions, self.nProbes,
+                           self.nProbePrunings, self.probeTime, self.nBackjumps,
+                           self.nNogoodPrunings)
+
+    def next_var(self, var_ord, val_ord):
+        '''Pick the next variable to branch on, take it out of the
+           unassigned set and return a new choice point for it:
+           [var, values to try, index of next value, trail marker]'''
+        if var_ord:
+            var = var_ord(self.csp)
         else:
-            ##Figure out which variable to assign,
-            ##Then remove it from the list of unassigned vars
-            if var_ord:
-              var = var_ord(self.csp)
-            else:
-              var = self.unasgn_vars[0]
-            self.unasgn_vars.remove(var) 
-
-            if self.TRACE:
-                print('  ' * level, "bt_recurse var = ", var)
-
-            if val_ord:
-              value_order = val_ord(self.csp,var)
-            else:
-              value_order = var.cur_domain()
-
-            for val in value_order:
+            var = self.unasgn_vars[self.unasgn_start]
+        self.take_unasgn_var(var)
+        if val_ord:
+            value_order = val_ord(self.csp, var)
+        else:
+            value_order = var.cur_domain()
+        return [var, value_order, 0, self.trail.mark()]
+
+    def bt_iterate(self, propagator, var_ord, val_ord, limits=None):
+        '''Search for the first solution. Return True if one was found
+           (the variables are then left assigned), False if there is none
+           and None if a limit was reached (self.limit says which)'''
+        for _ in self.search_solutions(propagator, var_ord, val_ord, limits):
+            return True
+        return None if self.limit is not None else False
+
+    def search_solutions(self, propagator, var_ord, val_ord, limits=None):
+        '''Depth-first search with an explicit stack of choice points
+           instead of recursion. A generator: it yields (True) each time
+           the variables are assigned to a solution and carries on from
+           there when resumed. When it returns the search is over: the
+           tree is exhausted, or a limit was reached (self.limit says
+           which)'''
+        nvars = len(self.unasgn_vars)
+        if self.unasgn_start == nvars:
+            #all variables assigned
+            yield True
+            return
 
+        trail = self.trail
+        on_decision = self.hooks['decision']
+        on_backtrack = self.hooks['backtrack']
+        check_at = limits.next_check(0) if limits is not None else -1
+        stack = [self.next_var(var_ord, val_ord)]
+        while stack:
+            frame = stack[-1]
+            var, value_order, i, mark = frame
+            if var.is_assigned():
+                #last value failed (or its subtree did): undo it
                 if self.TRACE:
-                    print('  ' * level, "bt_recurse trying", var, "=", val)
+                    print('  ' * len(stack), "bt_iterate restoring ", trail.prunings_since(mark))
+                trail.undo(mark)
+                var.unassign()
+            if i == len(value_order):
+                #no values left: backtrack to the previous choice point
+                self.nBacktracks += 1
+                if on_backtrack:
+                    for callback in on_backtrack:
+                        callback(var, len(stack))
+                stack.pop()
+                self.restoreUnasgnVar(var)
+                continue
+            if self.nDecisions == check_at:
+                self.limit = limits.reached(self)
+                if self.limit is not None:
+                    for frame in stack:
+                        if frame[0].is_assigned():
+                            frame[0].unassign()
+                    return
+                check_at = limits.next_check(self.nDecisions)
+            frame[2] = i + 1
+            val = value_order[i]
 
-                var.assign(val)
-                self.nDecisions = self.nDecisions+1
+            if self.TRACE:
+                print('  ' * len(stack), "bt_iterate trying", var, "=", val)
 
-                status, prunings = propagator(self.csp, var)
-                self.nPrunings = self.nPrunings + len(prunings)
+            var.assign(val)
+            self.nDecisions = self.nDecisions+1
+            if len(stack) > self.maxDepth:
+                self.maxDepth = len(stack)
+            if on_decision:
+                for callback in on_decision:
+                    callback(var, val, len(stack))
+            status = self.propagate(propagator, var)
 
-                if self.TRACE:
-                    print('  ' * level, "bt_recurse prop status = ", status)
-                    print('  ' * level, "bt_recurse prop pruned = ", prunings)
+            if self.TRACE:
+                print('  ' * len(stack), "bt_iterate prop status = ", status)
+                print('  ' * len(stack), "bt_iterate prop pruned = ", trail.prunings_since(mark))
+
+            if status:
+                if self.unasgn_start == nvars:
+                    yield True
+                else:
+                    stack.append(self.next_var(var_ord, val_ord))
+
+    def bt_backjump(self, propagator, var_ord, val_ord, limits=None, nogoods=None):
+        '''bt_iterate with backjumping (and nogood learning, with a
+           NogoodStore): search_solutions_cbj for the first solution'''
+        for _ in self.search_solutions_cbj(propagator, var_ord, val_ord, limits, nogoods):
+            return True
+        return None if self.limit is not None else False
+
+    def search_solutions_cbj(self, propagator, var_ord, val_ord, limits=None, nogoods=None):
+        '''search_solutions with conflict-directed backjumping. Needs the
+           ExplainingTrail of start_search(..., explain=True).
+
+           The decision at depth d is level d (bit 1 << d). Each choice
+           point collects in its conflict set the levels to blame for the
+           failures of its values: trail.conflict() after a propagator
+           failure, the other decisions of a nogood that skipped a value.
+           When its values run out, those levels and the explanation of
+           the values pruned before it was chosen are why: the search
+           jumps back to the latest of them, skipping the choice points
+           in between (no value there can help), and hands it the rest
+           of the conflict set. An empty conflict means there is no
+           solution at all. With nogoods the decisions of the conflict
+           are learned as a nogood.
+
+           Below a solution the jump is always to the previous choice
+           point and nothing is learned, so resuming after a solution
+           enumerates the remaining ones as search_solutions does, in the
+           same order for orderings that depend on the current domains
+           alone (see bt_search).'''
+        nvars = len(self.unasgn_vars)
+        if self.unasgn_start == nvars:
+            yield True
+            return
 
-                if status:
-                    if self.bt_recurse(propagator, var_ord,val_ord, level+1):
-                        return True
+        trail = self.trail
+        on_decision = self.hooks['decision']
+        on_backtrack = self.hooks['backtrack']
+        check_at = limits.next_check(0) if limits is not None else -1
 
-                if self.TRACE:
-                    print('  ' * level, "bt_recurse restoring ", prunings)
-                self.restoreValues(prunings)
+        def pop_frame():
+            var = stack.pop()[0]
+            if var.is_assigned():
+                trail.undecide(var)
                 var.unassign()
-
             self.restoreUnasgnVar(var)
-            return False
 
+        #choice points: [var, values to try, index of next value, trail
+        #marker, conflict set, True once a solution was found below]
+        stack = [self.next_var(var_ord, val_ord) + [0, False]]
+        while stack:
+            frame = stack[-1]
+            var, value_order, i, mark, conf, solved = frame
+            depth = len(stack)
+            if var.is_assigned():
+                if self.TRACE:
+                    print('  ' * depth, "bt_backjump restoring ", trail.prunings_since(mark))
+                trail.undo(mark)
+                trail.undecide(var)
+                var.unassign()
+            if i == len(value_order):
+                self.nBacktracks += 1
+                if on_backtrack:
+                    for callback in on_backtrack:
+                        callback(var, depth)
+                conflict = conf | trail.reasons.get(var, 0)
+                pop_frame()
+                target = conflict.bit_length() - 1
+                if target < 0:
+                    #nothing to blame but the root: no (more) solutions
+                    while stack:
+                        trail.undo(stack[-1][3])
+                        pop_frame()
+                    return
+                if nogoods is not None and not solved:
+                    nogoods.add([(stack[level - 1][0], stack[level - 1][0].get_assigned_value())
+                                 for level in range(1, target + 1) if conflict >> level & 1])
+                if self.TRACE and target < depth - 1:
+                    print('  ' * depth, "bt_backjump jumping back to depth", target)
+                while len(stack) > target:
+                    trail.undo(stack[-1][3])
+                    pop_frame()
+                    self.nBackjumps += 1
+                stack[-1][4] |= conflict & ~(1 << target)
+                stack[-1][5] = stack[-1][5] or solved
+                continue
+            if self.nDecisions == check_at:
+                self.limit = limits.reached(self)
+                if self.limit is not None:
+                    for frame in stack:
+                        if frame[0].is_assigned():
+                            trail.undecide(frame[0])
+                            frame[0].unassign()
+                    return
+                check_at = limits.next_check(self.nDecisions)
+            frame[2] = i + 1
+            val = value_order[i]
+
+            if nogoods is not None:
+                why = nogoods.blocks(var, val, trail.levels)
+                if why is not None:
+                    frame[4] |= why
+                    self.nNogoodPrunings += 1
+                    continue
 
+            if self.TRACE:
+                print('  ' * depth, "bt_backjump trying", var, "=", val)
+
+            var.assign(val)
+            trail.decide(var, depth)
+            self.nDecisions = self.nDecisions+1
+            if depth > self.maxDepth:
+                self.maxDepth = depth
+            if on_decision:
+                for callback in on_decision:
+                    callback(var, val, depth)
+            status = self.propagate(propagator, var)
+
+            if status:
+                if self.unasgn_start == nvars:
+                    yield True
+                    #every decision above is to blame for this subtree
+                    frame[4] |= (1 << depth) - 2
+                    frame[5] = True
+                else:
+                    stack.append(self.next_var(var_ord, val_ord) + [0, False])
+            else:
+                frame[4] |= trail.conflict() & ~(1 << depth)
@@ -0,0 +1,134 @@
+'''
+Solve many Kropki boards at once.
+
+solve_many fans a sequence of KropkiBoards out over a pool of worker
+processes and yields one SolveResult per board. Workers live for the
+whole batch, so anything cached per process (the shared relation tables
+of cspbase.RELATIONS and, by default, a TemplateCache of compiled
+models) is built once per worker and stays warm for every board that
+worker solves.
+
+NOTE: on platforms that start workers with "spawn" (Windows, macOS) the
+calling script must guard its entry point with
+if __name__ == '__main__':
+'''
+
+import multiprocessing
+import time
+
+from cspbase import BT
+from kropki_csp import kropki_csp_model_1
+from kropki_template import TemplateCache
+from propagators import prop_GAC, ord_mrv
+
+
+class SolveResult:
+    '''The outcome of solving one board:
+       index      === position of the board in the input sequence
+       solution   === list of rows of cell values, or None if the board
+                      has no solution or the search hit a limit
+                      (stats.limit then names it)
+       decisions  === number of variable assignments made by the search
+       prunings   === number of values pruned during the search
+       cpu_time   === CPU seconds spent building the model and searching
+       stats      === the SearchStats of the search
+    '''
+
+    def __init__(self, index, solution, decisions, prunings, cpu_time, stats=None):
+        self.index = index
+        self.solution = solution
+        self.decisions = decisions
+        self.prunings = prunings
+        self.cpu_time = cpu_time
+        self.stats = stats
+
+    @property
+    def solved(self):
+        return self.solution is not None
+
+    def __repr__(self):
+        return "SolveResult(index={}, solved={}, decisions={}, prunings={}, cpu_time={:.4f})".format(
+            self.index, self.solved, self.decisions, self.prunings, self.cpu_time)
+
+
+def solve_board(board, model=kropki_csp_model_1, propagator=prop_GAC,
+                var_ord=ord_mrv, val_ord=None, extensional=False, index=0,
+                templates=None, limits=None):
+    '''Build the model of board (from the TemplateCache templates if
+       given), search it silently within limits (a SearchLimits, if
+       given) and return a SolveResult'''
+    stime = time.process_time()
+    if templates is not None:
+        csp, variables = templates.model(model, board, extensional, reuse=True)
+    else:
+        csp, variables = model(board, extensional=extensional)
+    bt = BT(csp)
+    bt.verbose_off()
+    stats = bt.bt_search(propagator, var_ord, val_ord, limits)
+    solution = None
+    if stats:
+        solution = solution_grid(board, variables)
+    return SolveResult(index, solution, stats.decisions, stats.prunings,
+                       time.process_time() - stime, stats)
+
+
+def solution_grid(board, variables):
+    '''Return the assigned values of the model variables as a list of rows'''
+    return [[variables[i * board.dim + j].get_assigned_value() for j in range(board.dim)]
+            for i in range(board.dim)]
+
+
+def solve_many(boards, model=kropki_csp_model_1, propagator=prop_GAC,
+               var_ord=ord_mrv, val_ord=None, extensional=False,
+               jobs=None, ordered=True, chunksize=1, templates=True, limits=None):
+    '''Solve every KropkiBoard in boards and yield a SolveResult for each.
+
+       model, propagator, var_ord and val_ord are passed on to the search
+       (they must be module level functions so that workers can find
+       them). jobs is the number of worker processes (default: one per
+       CPU); with jobs=1 the boards are solved in this process. If
+       ordered, results come back in input order, otherwise as soon as
+       they complete (use SolveResult.index to match them up). Larger
+       chunksizes cut the per-board messaging cost for big batches of
+       easy boards. If templates, models are instantiated from a
+       TemplateCache (one per process) instead of being built from
+       scratch for every board. limits (a SearchLimits) applies to each
+       board on its own; boards that hit it come back unsolved with
+       stats.limit set, to be retried or escalated.'''
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    if jobs <= 1:
+        cache = TemplateCache() if templates else None
+        for i, board in enumerate(boards):
+            yield solve_board(board, model, propagator, var_ord, val_ord, extensional, i,
+                              cache, limits)
+        return
+
+    settings = (model, propagator, var_ord, val_ord, extensional, limits, templates)
+    with multiprocessing.Pool(jobs, initializer=init_worker, initargs=(settings,)) as pool:
+        run = pool.imap if ordered else pool.imap_unordered
+        for result in run(solve_task, enumerate(boards), chunksize):
+            yield result
+
+
+#per worker process: the settings every board is solved with and the
+#worker's TemplateCache (or None)
+WorkerSettings = None
+WorkerTemplates = None
+
+
+def init_worker(settings):
+    '''Pool initializer: remember the solve settings for this worker.
+       The shared relations (and templates) are built by the first board
+       of each kind a worker sees and reused for the rest of the batch.'''
+    global WorkerSettings, WorkerTemplates
+    WorkerSettings = settings[:6]
+    WorkerTemplates = TemplateCache() if settings[6] else None
+
+
+def solve_task(task):
+    '''Worker side of solve_many: task is an (index, board) pair'''
+    index, board = task
+    model, propagator, var_ord, val_ord, extensional, limits = WorkerSettings
+    return solve_board(board, model, propagator, var_ord, val_ord, extensional, index,
+                       WorkerTemplates, limits)
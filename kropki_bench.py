@@ -0,0 +1,265 @@
+'''
+Benchmarks for the Kropki models, propagators and variable orderings.
+
+    python kropki_bench.py run [--out results.json] [--corpus FILE]
+                               [--sizes 6 9 12] [--grades easy medium hard minimal]
+                               [--timeout SECONDS] [--repeat N]
+                               [--dots marked complete]
+    python kropki_bench.py compare baseline.json results.json [--tolerance 0.25]
+
+run solves every puzzle of the corpus (by default the bundled
+kropki_bench_corpus.txt) with every combination of
+
+    model      === kropki_csp_model_1, kropki_csp_model_2
+    propagator === prop_BT, prop_FC, prop_GAC
+    order      === default (static) order, ord_mrv
+    dots       === marked: only the dots on the board constrain cells;
+                   complete: also every pair without a dot is neither
+                   consecutive nor double (the models' complete_dots)
+
+and writes one record per (puzzle, combination) to JSON: status (solved,
+unsat or timeout), wall and CPU seconds for the whole run, model build
+seconds, decisions, prunings and peak resident memory. Every run is made
+in a fresh child process, so runs cannot warm caches for each other,
+a run over the timeout can be killed, and the peak memory is that run's
+own (it includes the interpreter, about the same for every run). With
+--repeat N each combination is run N times and the fastest run kept.
+With both dots settings, run ends with a table of the mean decisions of
+each board size under either, over the runs that solved both ways.
+
+compare matches up the records of two result files and reports every
+run that regressed: it no longer solves, it makes more decisions or
+prunings (the search itself changed), or it takes more than tolerance
+longer in CPU time. It exits with status 1 if there is any regression.
+
+Corpus files are in the kropki_io text format; a comment line
+"# group: <dim>x<dim> <grade>" sets the size and grade of the puzzles
+after it.
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+
+from cspbase import BT
+from kropki_csp import kropki_csp_model_1, kropki_csp_model_2
+from kropki_io import parse_board
+from propagators import prop_BT, prop_FC, prop_GAC, ord_mrv
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kropki_bench_corpus.txt')
+
+MODELS = {'model_1': kropki_csp_model_1, 'model_2': kropki_csp_model_2}
+PROPAGATORS = {'BT': prop_BT, 'FC': prop_FC, 'GAC': prop_GAC}
+ORDERS = {'default': None, 'mrv': ord_mrv}
+DOTS = {'marked': False, 'complete': True}
+
+
+def read_corpus(path=CORPUS):
+    '''Return the puzzles of a corpus file as a list of dicts with keys
+       name, dim, grade and line (the puzzle in kropki_io text format)'''
+    puzzles = []
+    grade = None
+    counts = dict()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('# group:'):
+                grade = line.split()[-1]
+                continue
+            if not line or line.startswith('#'):
+                continue
+            dim = int(line.split(':')[0])
+            counts[(dim, grade)] = counts.get((dim, grade), 0) + 1
+            puzzles.append({'name': '{}x{}-{}-{}'.format(dim, dim, grade, counts[(dim, grade)]),
+                            'dim': dim, 'grade': grade, 'line': line})
+    return puzzles
+
+
+def run_one(line, model, propagator, order, dots, conn):
+    '''Child process side of measure: solve one puzzle and send back the
+       measurements'''
+    board = parse_board(line)
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    csp, variables = MODELS[model](board, complete_dots=DOTS[dots])
+    build = time.process_time() - cpu
+    bt = BT(csp)
+    bt.verbose_off()
+    status = bt.bt_search(PROPAGATORS[propagator], ORDERS[order])
+    conn.send({'status': 'solved' if status else 'unsat',
+               'wall': time.perf_counter() - wall,
+               'cpu': time.process_time() - cpu,
+               'build': build,
+               'decisions': bt.nDecisions,
+               'prunings': bt.nPrunings,
+               'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss})
+    conn.close()
+
+
+def measure(line, model, propagator, order, dots, timeout):
+    '''Solve the puzzle line in a child process and return its
+       measurements, or a timeout record if it runs over timeout seconds'''
+    recv, send = multiprocessing.Pipe(duplex=False)
+    child = multiprocessing.Process(target=run_one, args=(line, model, propagator, order, dots,
+                                                                send))
+    child.start()
+    send.close()
+    status = 'timeout'
+    if recv.poll(timeout):
+        try:
+            result = recv.recv()
+            status = None
+        except EOFError:
+            #the child died without answering
+            status = 'error'
+    if status == 'timeout':
+        child.kill()
+    child.join()
+    if status is not None:
+        result = {'status': status, 'wall': None, 'cpu': None, 'build': None,
+                  'decisions': None, 'prunings': None, 'peak_rss_kb': None}
+    return result
+
+
+def run(puzzles, timeout=60, repeat=1, out=sys.stdout, dots=('marked',)):
+    '''Run every combination on every puzzle and return the list of
+       records, printing a line per record to out'''
+    runs = []
+    for p in puzzles:
+        for model in MODELS:
+            for propagator in PROPAGATORS:
+                for order in ORDERS:
+                    for d in dots:
+                        best = None
+                        for _ in range(repeat):
+                            result = measure(p['line'], model, propagator, order, d, timeout)
+                            if best is None or (result['cpu'] is not None and
+                                                (best['cpu'] is None or result['cpu'] < best['cpu'])):
+                                best = result
+                        record = {'puzzle': p['name'], 'dim': p['dim'], 'grade': p['grade'],
+                                  'model': model, 'propagator': propagator, 'order': order,
+                                  'dots': d}
+                        record.update(best)
+                        runs.append(record)
+                        if out is not None:
+                            print(format_record(record), file=out, flush=True)
+    return runs
+
+
+def format_record(r):
+    if r['cpu'] is None:
+        return "{:<18} {:<8} {:<4} {:<8} {:<8} {}".format(r['puzzle'], r['model'], r['propagator'],
+                                                         r['order'], r['dots'], r['status'])
+    return "{:<18} {:<8} {:<4} {:<8} {:<8} {:<7} cpu {:8.3f}s build {:.4f}s {:>8} decisions {:>9} prunings {:>7} KB".format(
+        r['puzzle'], r['model'], r['propagator'], r['order'], r['dots'], r['status'], r['cpu'],
+        r['build'], r['decisions'], r['prunings'], r['peak_rss_kb'])
+
+
+def record_key(r):
+    #result files from before the dots setting are all 'marked'
+    return (r['puzzle'], r['model'], r['propagator'], r['order'], r.get('dots', 'marked'))
+
+
+def dots_summary(runs):
+    '''Return lines comparing the mean decisions of marked and complete
+       dots per board size, over the runs that solved both ways'''
+    marked = dict((record_key(r)[:4], r) for r in runs
+                  if r.get('dots', 'marked') == 'marked' and r['status'] == 'solved')
+    sums = dict()
+    for r in runs:
+        m = marked.get(record_key(r)[:4])
+        if r.get('dots') != 'complete' or r['status'] != 'solved' or m is None:
+            continue
+        s = sums.setdefault(r['dim'], [0, 0, 0])
+        s[0] += 1
+        s[1] += m['decisions']
+        s[2] += r['decisions']
+    lines = []
+    for dim in sorted(sums):
+        n, before, after = sums[dim]
+        lines.append("{}x{}: {} runs, mean decisions {:.1f} marked -> {:.1f} complete ({:+.0%})".format(
+            dim, dim, n, before / n, after / n, after / before - 1 if before else 0))
+    return lines
+
+
+def compare(baseline, current, tolerance=0.25):
+    '''Return a list of messages, one per run of current that regressed
+       against the same run in baseline (both lists of records)'''
+    base = dict((record_key(r), r) for r in baseline)
+    regressions = []
+    for r in current:
+        b = base.get(record_key(r))
+        if b is None:
+            continue
+        name = ' '.join(record_key(r))
+        if b['status'] != r['status']:
+            if b['status'] != 'timeout':
+                regressions.append("{}: {} -> {}".format(name, b['status'], r['status']))
+            continue
+        if r['cpu'] is None:
+            continue
+        for counter in ('decisions', 'prunings'):
+            if r[counter] > b[counter]:
+                regressions.append("{}: {} {} -> {}".format(name, counter, b[counter], r[counter]))
+        if r['cpu'] > b['cpu'] * (1 + tolerance):
+            regressions.append("{}: cpu {:.3f}s -> {:.3f}s ({:+.0%})".format(
+                name, b['cpu'], r['cpu'], r['cpu'] / b['cpu'] - 1 if b['cpu'] else float('inf')))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kropki solver benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+    p = commands.add_parser('run', help="run the benchmarks")
+    p.add_argument('--out', default='results.json')
+    p.add_argument('--corpus', default=CORPUS)
+    p.add_argument('--sizes', type=int, nargs='+', default=[6, 9, 12])
+    p.add_argument('--grades', nargs='+', default=['easy', 'medium', 'hard', 'minimal'])
+    p.add_argument('--timeout', type=float, default=60)
+    p.add_argument('--repeat', type=int, default=1)
+    p.add_argument('--dots', nargs='+', choices=sorted(DOTS), default=['marked'],
+                   help="read missing dots as unconstrained (marked) and/or as "
+                        "neither relation (complete)")
+    p = commands.add_parser('compare', help="flag regressions against a baseline")
+    p.add_argument('baseline')
+    p.add_argument('current')
+    p.add_argument('--tolerance', type=float, default=0.25,
+                   help="allowed relative CPU time increase (default 0.25)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        puzzles = [p for p in read_corpus(args.corpus)
+                   if p['dim'] in args.sizes and p['grade'] in args.grades]
+        runs = run(puzzles, args.timeout, args.repeat, dots=args.dots)
+        for line in dots_summary(runs):
+            print(line)
+        meta = {'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'corpus': os.path.basename(args.corpus),
+                'timeout': args.timeout,
+                'repeat': args.repeat,
+                'dots': args.dots}
+        with open(args.out, 'w') as f:
+            json.dump({'meta': meta, 'runs': runs}, f, indent=1)
+        print("wrote {} runs to {}".format(len(runs), args.out))
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['runs']
+        with open(args.current) as f:
+            current = json.load(f)['runs']
+        regressions = compare(baseline, current, args.tolerance)
+        for msg in regressions:
+            print("REGRESSION", msg)
+        print("{} regressions".format(len(regressions)))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
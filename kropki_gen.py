@@ -0,0 +1,164 @@
+'''
+Generate Kropki puzzles with a unique solution.
+
+generate_puzzle(dim, seed)
+    1. solves an empty board without dots with a random value order,
+       which gives a random full grid;
+    2. marks every dot of that grid: a white (consecutive) dot between
+       neighbours that differ by one and a black (double) dot between
+       neighbours where one is twice the other (1 and 2 get both);
+    3. starts with every cell given and tries to remove the givens one
+       at a time, in random order, keeping a removal only if the
+       solution stays unique.
+
+The puzzle before a removal has exactly one solution, the grid, so the
+removal of cell x (value v) keeps it unique iff the puzzle has no
+solution with x != v. Each removal is therefore checked by a single
+search on x's domain minus v, which usually fails at or near the root,
+rather than by counting solutions.
+
+All the checks of a puzzle run on one model: it is built once, and a
+check only resets the domain of the one cell being removed (and a
+removal leaves that cell with its full domain), so nothing else is
+rebuilt between checks. A check that exceeds its decision budget counts
+as not unique and the given is kept. With every dot marked the grid is
+often the only solution even without givens; that is tested first, and
+then no removal needs checking.
+
+generate_many runs generate_puzzle for a range of seeds over a process
+pool. Run as a script to write puzzles to stdout in the kropki_io text
+format (or packed, with --packed):
+
+    python kropki_gen.py [--dim 9] [--count 100] [--seed 0] [--jobs N] [--packed]
+'''
+
+import argparse
+import multiprocessing
+import random
+import sys
+
+from cspbase import BT, SearchLimits
+from kropki_csp import KropkiBoard, kropki_csp_model_2
+from kropki_io import format_board, write_packed
+from propagators import prop_GAC, ord_mrv, val_random
+
+
+def random_grid(dim, seed):
+    '''Return a random full grid (list of rows) of dimension dim'''
+    empty = [[0] * (dim - 1) for _ in range(dim)]
+    board = KropkiBoard(dim, [[-1] * dim for _ in range(dim)], empty, empty, empty, empty)
+    csp, variables = kropki_csp_model_2(board)
+    bt = BT(csp)
+    bt.verbose_off()
+    bt.bt_search(prop_GAC, ord_mrv, val_random(seed))
+    return [[variables[i * dim + j].get_assigned_value() for j in range(dim)]
+            for i in range(dim)]
+
+
+def grid_dots(grid):
+    '''Return (consec_row, consec_col, double_row, double_col) marking
+       every dot of the full grid'''
+    dim = len(grid)
+
+    def consec(a, b):
+        return 1 if abs(a - b) == 1 else 0
+
+    def double(a, b):
+        return 1 if a == 2 * b or b == 2 * a else 0
+
+    consec_row = [[consec(grid[i][j], grid[i][j + 1]) for j in range(dim - 1)] for i in range(dim)]
+    double_row = [[double(grid[i][j], grid[i][j + 1]) for j in range(dim - 1)] for i in range(dim)]
+    consec_col = [[consec(grid[j][i], grid[j + 1][i]) for j in range(dim - 1)] for i in range(dim)]
+    double_col = [[double(grid[j][i], grid[j + 1][i]) for j in range(dim - 1)] for i in range(dim)]
+    return consec_row, consec_col, double_row, double_col
+
+
+def generate_puzzle(dim, seed, check_decisions=10000):
+    '''Return (board, grid): a KropkiBoard whose unique solution is grid.
+       check_decisions is the search budget of each uniqueness check.'''
+    rnd = random.Random(seed)
+    grid = random_grid(dim, rnd.randrange(1 << 30))
+    consec_row, consec_col, double_row, double_col = grid_dots(grid)
+    cells = [list(row) for row in grid]
+    board = KropkiBoard(dim, cells, consec_row, consec_col, double_row, double_col)
+
+    #one model for every check: all cells given to start with
+    csp, variables = kropki_csp_model_2(board)
+    bt = BT(csp)
+    bt.verbose_off()
+    limits = SearchLimits(decisions=check_decisions)
+    domain = list(range(1, dim + 1))
+
+    #with every dot marked the grid is often unique without any given,
+    #and then every removal would pass: check that case in one go
+    for var in variables:
+        var.reset_domain(domain)
+    csp.domain_buckets = None
+    if bt.count_solutions(prop_GAC, ord_mrv, None, 2, limits) == 1 and bt.stats.limit is None:
+        for row in cells:
+            row[:] = [-1] * dim
+        return board, grid
+    for k, var in enumerate(variables):
+        var.reset_domain([grid[k // dim][k % dim]])
+    csp.domain_buckets = None
+
+    order = list(range(dim * dim))
+    rnd.shuffle(order)
+    for k in order:
+        var = variables[k]
+        value = grid[k // dim][k % dim]
+        var.reset_domain([v for v in domain if v != value])
+        csp.domain_buckets = None
+        if bt.bt_search(prop_GAC, ord_mrv, None, limits).status is False:
+            #no other value works: the given can go
+            var.reset_domain(domain)
+            cells[k // dim][k % dim] = -1
+        else:
+            var.reset_domain([value])
+        csp.domain_buckets = None
+    return board, grid
+
+
+def generate_task(task):
+    dim, seed, check_decisions = task
+    return generate_puzzle(dim, seed, check_decisions)
+
+
+def generate_many(dim, count, seed=0, jobs=None, check_decisions=10000):
+    '''Yield (board, grid) for count puzzles of dimension dim, made from
+       seeds seed, seed+1, ... by jobs worker processes (default: one per
+       CPU; jobs=1 generates in this process). Puzzles come in the order
+       they are finished.'''
+    tasks = ((dim, s, check_decisions) for s in range(seed, seed + count))
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    if jobs <= 1:
+        for task in tasks:
+            yield generate_task(task)
+        return
+    with multiprocessing.Pool(jobs) as pool:
+        for result in pool.imap_unordered(generate_task, tasks, 4):
+            yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate unique Kropki puzzles")
+    parser.add_argument('--dim', type=int, default=9, choices=[6, 9, 12])
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--packed', action='store_true',
+                        help="write packed binary puzzles instead of text lines")
+    args = parser.parse_args(argv)
+
+    boards = (board for board, grid in
+              generate_many(args.dim, args.count, args.seed, args.jobs))
+    if args.packed:
+        write_packed(boards, sys.stdout.buffer)
+    else:
+        for board in boards:
+            sys.stdout.write(format_board(board) + '\n')
+
+
+if __name__ == '__main__':
+    main()
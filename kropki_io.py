@@ -0,0 +1,253 @@
+'''
+Read and write KropkiBoards, one puzzle at a time.
+
+Text format: one puzzle per line,
+
+    <dim>:<cells>:<row dots>:<col dots>
+
+    cells     === dim*dim characters in row-major order, '.' for an empty
+                  cell, otherwise the value as a base 36 digit (1-9, a, b, c...)
+    row dots  === dim*(dim-1) characters, one per pair of neighbouring cells
+                  of a row, row by row (i.e. consec_row/double_row flattened)
+    col dots  === dim*(dim-1) characters, one per pair of neighbouring cells
+                  of a column, column by column (consec_col/double_col flattened)
+
+    a dot character is 0 (no dot), 1 (white: consecutive), 2 (black:
+    double) or 3 (both)
+
+Blank lines and lines starting with '#' are skipped, as are malformed
+lines (reported on stderr, so they never mix with solutions on stdout).
+
+Packed format: the 4 bytes PACKED_MAGIC followed by one record per puzzle,
+
+    1 byte dim, the cells at 4 bits each (0 for empty), then the row dots
+    and the col dots at 2 bits each, each part padded to whole bytes.
+
+A 9x9 puzzle takes 229 bytes of text or 78 packed bytes.
+
+Everything here works on iterators, so solve_lines/solve_packed pipe a
+file of any length from input to output holding one puzzle at a time.
+Run as a script to solve stdin to stdout:
+
+    python kropki_io.py [--model 1|2] [--propagator BT|FC|GAC|CT] [--extensional]
+                        [--complete-dots] [--packed] < puzzles > solutions
+
+Each solution is written as a text line with every cell filled in, or
+a '-' line (NO_SOLUTION) if the puzzle has none.
+'''
+
+import argparse
+import sys
+
+from kropki_csp import (KropkiBoard, kropki_csp_model_1, kropki_csp_model_2,
+                        kropki_csp_model_1_complete, kropki_csp_model_2_complete)
+from kropki_batch import solve_board
+from kropki_template import TemplateCache
+from propagators import prop_BT, prop_FC, prop_GAC, prop_CT, ord_mrv
+
+PACKED_MAGIC = b'KRP1'
+NO_SOLUTION = '-'
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def format_board(board, cell_values=None):
+    '''Return the text line (without newline) encoding board. If
+       cell_values is given it replaces the board's own cells (used to
+       write solutions).'''
+    if cell_values is None:
+        cell_values = board.cell_values
+    dim = board.dim
+    cells = ''.join(DIGITS[v] if v > 0 else '.' for row in cell_values for v in row)
+    rows = ''.join(str(dot_code(board.consec_row[i][j], board.double_row[i][j]))
+                   for i in range(dim) for j in range(dim - 1))
+    cols = ''.join(str(dot_code(board.consec_col[i][j], board.double_col[i][j]))
+                   for i in range(dim) for j in range(dim - 1))
+    return '{}:{}:{}:{}'.format(dim, cells, rows, cols)
+
+
+def parse_board(line):
+    '''Return the KropkiBoard encoded by a text line, or None (after
+       printing why) if the line is malformed'''
+    try:
+        dim, cells, rows, cols = line.strip().split(':')
+        dim = int(dim)
+        values = [DIGITS.index(c) if c != '.' else -1 for c in cells.lower()]
+        row_dots = [int(c) for c in rows]
+        col_dots = [int(c) for c in cols]
+    except ValueError:
+        print("Error: malformed puzzle line {!r}".format(line), file=sys.stderr)
+        return None
+    if dim < 3 or dim % 3 or len(values) != dim * dim or len(row_dots) != dim * (dim - 1) \
+            or len(col_dots) != dim * (dim - 1) or max(values + [0]) > dim \
+            or max(row_dots + col_dots + [0]) > 3:
+        print("Error: puzzle line {!r} does not fit a {}x{} board".format(line, dim, dim),
+              file=sys.stderr)
+        return None
+    return make_board(dim, values, row_dots, col_dots)
+
+
+def make_board(dim, values, row_dots, col_dots):
+    '''Build a KropkiBoard from flat lists of cell values (-1 for empty)
+       and dot codes'''
+    n = dim - 1
+    cell_values = [values[i * dim:(i + 1) * dim] for i in range(dim)]
+    consec_row = [[row_dots[i * n + j] & 1 for j in range(n)] for i in range(dim)]
+    double_row = [[row_dots[i * n + j] >> 1 for j in range(n)] for i in range(dim)]
+    consec_col = [[col_dots[i * n + j] & 1 for j in range(n)] for i in range(dim)]
+    double_col = [[col_dots[i * n + j] >> 1 for j in range(n)] for i in range(dim)]
+    return KropkiBoard(dim, cell_values, consec_row, consec_col, double_row, double_col)
+
+
+def dot_code(consec, double):
+    return (1 if consec else 0) | (2 if double else 0)
+
+
+def read_boards(lines):
+    '''Yield the KropkiBoard of every puzzle line in lines (e.g. an open
+       text file), skipping blank lines, comments and malformed lines'''
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        board = parse_board(line)
+        if board is not None:
+            yield board
+
+
+def write_boards(boards, out):
+    '''Write every board in boards to the text stream out, one per line'''
+    for board in boards:
+        out.write(format_board(board) + '\n')
+
+
+def pack_board(board):
+    '''Return the packed record (bytes) of board'''
+    dim = board.dim
+    if dim > 15:
+        print("Error: packed format holds boards up to 15x15, not {}x{}".format(dim, dim),
+              file=sys.stderr)
+        return None
+    cells = [max(v, 0) for row in board.cell_values for v in row]
+    rows = [dot_code(board.consec_row[i][j], board.double_row[i][j])
+            for i in range(dim) for j in range(dim - 1)]
+    cols = [dot_code(board.consec_col[i][j], board.double_col[i][j])
+            for i in range(dim) for j in range(dim - 1)]
+    return bytes([dim]) + pack_bits(cells, 4) + pack_bits(rows, 2) + pack_bits(cols, 2)
+
+
+def pack_bits(codes, width):
+    '''Pack small ints of width bits each into bytes, low bits first'''
+    per_byte = 8 // width
+    out = bytearray((len(codes) + per_byte - 1) // per_byte)
+    for k, code in enumerate(codes):
+        out[k // per_byte] |= code << (width * (k % per_byte))
+    return bytes(out)
+
+
+def unpack_bits(data, count, width):
+    '''Inverse of pack_bits: return the first count codes in data'''
+    per_byte = 8 // width
+    mask = (1 << width) - 1
+    return [(data[k // per_byte] >> (width * (k % per_byte))) & mask for k in range(count)]
+
+
+def packed_sizes(dim):
+    '''Return the byte sizes of the cells and of each dots part of a
+       packed record of dimension dim'''
+    return (dim * dim + 1) // 2, (dim * (dim - 1) + 3) // 4
+
+
+def write_packed(boards, out):
+    '''Write the magic header and then every board in boards to the binary
+       stream out'''
+    out.write(PACKED_MAGIC)
+    for board in boards:
+        record = pack_board(board)
+        if record is not None:
+            out.write(record)
+
+
+def read_packed(stream):
+    '''Yield the KropkiBoard of every record in the binary stream'''
+    if stream.read(len(PACKED_MAGIC)) != PACKED_MAGIC:
+        print("Error: not a packed Kropki puzzle stream", file=sys.stderr)
+        return
+    while True:
+        head = stream.read(1)
+        if not head:
+            return
+        dim = head[0]
+        cell_size, dots_size = packed_sizes(dim)
+        data = stream.read(cell_size + 2 * dots_size)
+        if len(data) != cell_size + 2 * dots_size:
+            print("Error: truncated packed record", file=sys.stderr)
+            return
+        values = [v if v > 0 else -1 for v in unpack_bits(data, dim * dim, 4)]
+        row_dots = unpack_bits(data[cell_size:], dim * (dim - 1), 2)
+        col_dots = unpack_bits(data[cell_size + dots_size:], dim * (dim - 1), 2)
+        if dim < 3 or dim % 3 or max(values + [0]) > dim:
+            print("Error: packed record does not fit a {}x{} board".format(dim, dim),
+                  file=sys.stderr)
+            continue
+        yield make_board(dim, values, row_dots, col_dots)
+
+
+def solve_boards(boards, model=kropki_csp_model_1, propagator=prop_GAC,
+                 var_ord=ord_mrv, val_ord=None, extensional=False, templates=True):
+    '''Yield the solution line (see format_board) of every board in
+       boards, or NO_SOLUTION, solving each board as it is read. If
+       templates, models come from a TemplateCache kept for the whole
+       stream, so boards sharing a size and dot layout reuse one model
+       instead of each being built from scratch.'''
+    cache = TemplateCache() if templates else None
+    for board in boards:
+        result = solve_board(board, model, propagator, var_ord, val_ord, extensional,
+                             templates=cache)
+        if result.solved:
+            yield format_board(board, result.solution)
+        else:
+            yield NO_SOLUTION
+
+
+def solve_lines(lines, out, **options):
+    '''Solve every puzzle line in lines and write a solution line per
+       puzzle to out. options are those of solve_boards.'''
+    for line in solve_boards(read_boards(lines), **options):
+        out.write(line + '\n')
+
+
+def solve_packed(stream, out, **options):
+    '''Like solve_lines, for a binary stream of packed puzzles'''
+    for line in solve_boards(read_packed(stream), **options):
+        out.write(line + '\n')
+
+
+MODELS = {'1': kropki_csp_model_1, '2': kropki_csp_model_2}
+COMPLETE_MODELS = {'1': kropki_csp_model_1_complete, '2': kropki_csp_model_2_complete}
+PROPAGATORS = {'BT': prop_BT, 'FC': prop_FC, 'GAC': prop_GAC, 'CT': prop_CT}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve Kropki puzzles from stdin to stdout")
+    parser.add_argument('--model', choices=sorted(MODELS), default='1')
+    parser.add_argument('--propagator', choices=sorted(PROPAGATORS), default='GAC')
+    parser.add_argument('--extensional', action='store_true',
+                        help="model every constraint as a table (what CT filters fastest),"
+                             " except all-different ones too large to tabulate")
+    parser.add_argument('--complete-dots', action='store_true',
+                        help="a pair without a dot is neither consecutive nor double")
+    parser.add_argument('--packed', action='store_true',
+                        help="read packed binary puzzles instead of text lines")
+    args = parser.parse_args(argv)
+
+    models = COMPLETE_MODELS if args.complete_dots else MODELS
+    options = dict(model=models[args.model], propagator=PROPAGATORS[args.propagator],
+                   extensional=args.extensional)
+    if args.packed:
+        solve_packed(sys.stdin.buffer, sys.stdout, **options)
+    else:
+        solve_lines(sys.stdin, sys.stdout, **options)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+'''
+A NumPy engine for Kropki boards.
+
+The propagators of propagators.py work value by value on Variable and
+Constraint objects. TensorEngine instead holds the whole board as one
+N x N x N boolean candidate tensor,
+
+    cand[r, c, v - 1] === value v is still possible in cell (r, c)
+
+and propagates with array operations over every cell at once:
+
+    elimination     === the value of a cell with a single candidate is
+                        removed from the rest of its row, column and sub
+                        square, and a value with a single place left in
+                        a row, column or sub square is placed there
+    dot filtering   === a value survives next to a white (black) dot only
+                        if the cell across the dot still has a value
+                        consecutive to (double or half of) it
+
+repeated until nothing changes. A cell without candidates, a value with
+no place left in a group or two cells of a group fixed to the same value
+is a dead end. Search is depth first over the cells; backtracking
+restores a snapshot (a copy) of the tensor taken at each choice point.
+
+The propagation is weaker than prop_GAC on model_2 (no all-different
+matching), but it is sound, so searching cells in row-major order with
+values in increasing order finds the same first solution as bt_search
+with prop_GAC and the default orderings. With mrv=True the engine
+branches on the cell with fewest candidates instead: usually faster,
+and the same solution whenever the board has only one.
+
+NumPy is optional: the rest of the package does not need it, and
+solve_board_numpy prints a message and returns None without it.
+'''
+
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cspbase import Consecutive, Ratio2, SearchStats
+from kropki_batch import SolveResult
+
+
+class TensorEngine:
+    '''Candidate tensor of a KropkiBoard (see the module docstring),
+       with propagate, snapshot/restore and a depth first solve.
+
+       After solve: solution is the list of rows of the solution (or
+       None) and nDecisions, nPrunings, nBacktracks, nPropagations,
+       maxDepth, propTime and limit count the search as in BT.'''
+
+    def __init__(self, board):
+        if np is None:
+            raise ImportError("TensorEngine needs NumPy (pip install numpy)")
+        n = board.dim
+        self.board = board
+        self.dim = n
+        self.cand = np.ones((n, n, n), dtype=bool)
+        for r in range(n):
+            for c in range(n):
+                value = board.cell_values[r][c]
+                if value > 0:
+                    self.cand[r, c] = False
+                    self.cand[r, c, value - 1] = True
+        self.flat = self.cand.reshape(n * n, n)
+
+        #the cells of each row, column and sub square (3n groups of n
+        #cells), and where each cell sits in the groups of each kind
+        cells = np.arange(n * n).reshape(n, n)
+        width = n // 3
+        squares = cells.reshape(n // 3, 3, 3, width).transpose(0, 2, 1, 3).reshape(n, n)
+        self.groups = np.concatenate([cells, cells.T, squares])
+        self.inverse = np.argsort(self.groups.reshape(3, n * n), axis=1)
+
+        #relation matrices over values and the dots of each pair of
+        #neighbours: [r, c] of the row masks is between (r, c) and
+        #(r, c + 1), of the column masks between (r, c) and (r + 1, c)
+        values = range(1, n + 1)
+        self.dots = []
+        for kind, rows, cols in ((Consecutive, board.consec_row, board.consec_col),
+                                 (Ratio2, board.double_row, board.double_col)):
+            relation = np.array([[kind.related(a, b) for b in values] for a in values])
+            row_mask = np.array(rows, dtype=bool).reshape(n, n - 1)
+            col_mask = np.array(cols, dtype=bool).reshape(n, n - 1).T
+            if row_mask.any() or col_mask.any():
+                self.dots.append((relation, row_mask[:, :, None], col_mask[:, :, None]))
+
+        self.solution = None
+        self.clear_stats()
+
+    def clear_stats(self):
+        self.nDecisions = 0
+        self.nPrunings = 0
+        self.nBacktracks = 0
+        self.nPropagations = 0
+        self.maxDepth = 0
+        self.propTime = 0
+        self.limit = None
+
+    def snapshot(self):
+        '''Return a copy of the candidates, for restore'''
+        return self.cand.copy()
+
+    def restore(self, snapshot):
+        '''Put back the candidates of a snapshot'''
+        np.copyto(self.cand, snapshot)
+
+    def assign(self, cell, value):
+        '''Make value the only candidate of cell (a row-major index)'''
+        self.flat[cell] = False
+        self.flat[cell, value - 1] = True
+
+    def propagate(self):
+        '''Run elimination and dot filtering until nothing changes. Return
+           False if a dead end was found'''
+        start = time.perf_counter()
+        self.nPropagations += 1
+        status = True
+        count = np.count_nonzero(self.cand)
+        while status:
+            status = self.eliminate() and self.filter_dots()
+            before, count = count, np.count_nonzero(self.cand)
+            self.nPrunings += before - count
+            if count == before:
+                break
+        self.propTime += time.perf_counter() - start
+        return status
+
+    def eliminate(self):
+        '''One round of row, column and sub square elimination'''
+        n = self.dim
+        g = self.flat[self.groups]        #[group, cell in group, value]
+        sizes = g.sum(axis=2)
+        if not sizes.all():
+            return False
+        single = g & (sizes == 1)[:, :, None]
+        fixed = single.sum(axis=1)        #[group, value]
+        if (fixed > 1).any():
+            return False
+        places = g.sum(axis=1)
+        if not places.all():
+            return False
+        keep = single | ~(fixed > 0)[:, None, :]
+        hidden = g & (places == 1)[:, None, :]
+        keep &= hidden | ~hidden.any(axis=2)[:, :, None]
+        #each cell is in one group of each kind: AND its three verdicts
+        keep = keep.reshape(3, n * n, n)
+        self.flat &= keep[0, self.inverse[0]] & keep[1, self.inverse[1]] & keep[2, self.inverse[2]]
+        return True
+
+    def filter_dots(self):
+        '''One round of consecutive and double dot filtering'''
+        cand = self.cand
+        for relation, row_mask, col_mask in self.dots:
+            cand[:, :-1] &= (cand[:, 1:] @ relation) | ~row_mask
+            cand[:, 1:] &= (cand[:, :-1] @ relation) | ~row_mask
+            cand[:-1] &= (cand[1:] @ relation) | ~col_mask
+            cand[1:] &= (cand[:-1] @ relation) | ~col_mask
+        return cand.any(axis=2).all()
+
+    def next_cell(self, mrv=False):
+        '''The cell to branch on: the first one (or with mrv the one with
+           fewest candidates) with more than one candidate, or None'''
+        sizes = self.flat.sum(axis=1)
+        open_cells = np.flatnonzero(sizes > 1)
+        if not open_cells.size:
+            return None
+        if mrv:
+            return int(open_cells[np.argmin(sizes[open_cells])])
+        return int(open_cells[0])
+
+    def solve(self, mrv=False, limits=None):
+        '''Search for a solution and return a SearchStats (its solution
+           is None: the grid is left in self.solution). limits (a
+           SearchLimits) is honoured as by bt_search; len(self.trail)
+           is the number of snapshots held.'''
+        self.clear_stats()
+        self.solution = None
+        self.cpuStart = time.process_time()
+        self.wallStart = time.perf_counter()
+        initial = self.snapshot()
+
+        #choice points: [cell, values to try, index of next value, snapshot]
+        self.trail = []
+        status = self.propagate()
+        if status:
+            status = False
+            cell = self.next_cell(mrv)
+            if cell is None:
+                status = True
+            else:
+                self.trail.append([cell, np.flatnonzero(self.flat[cell]) + 1, 0, self.snapshot()])
+        check_at = limits.next_check(0) if limits is not None else -1
+        while self.trail:
+            frame = self.trail[-1]
+            cell, values, i, saved = frame
+            if i == len(values):
+                self.nBacktracks += 1
+                self.trail.pop()
+                continue
+            if self.nDecisions == check_at:
+                self.limit = limits.reached(self)
+                if self.limit is not None:
+                    status = None
+                    break
+                check_at = limits.next_check(self.nDecisions)
+            frame[2] = i + 1
+            if i > 0:
+                self.restore(saved)
+            self.assign(cell, int(values[i]))
+            self.nDecisions += 1
+            self.maxDepth = max(self.maxDepth, len(self.trail))
+            if self.propagate():
+                cell = self.next_cell(mrv)
+                if cell is None:
+                    status = True
+                    break
+                self.trail.append([cell, np.flatnonzero(self.flat[cell]) + 1, 0, self.snapshot()])
+
+        if status:
+            self.solution = (self.cand.argmax(axis=2) + 1).tolist()
+        self.trail = []
+        self.restore(initial)
+        return SearchStats(status, None, self.nDecisions, self.nPrunings, self.nBacktracks,
+                           self.maxDepth, self.nPropagations, self.propTime,
+                           time.perf_counter() - self.wallStart,
+                           time.process_time() - self.cpuStart, dict(), self.limit,
+                           1 if status else 0)
+
+
+def solve_board_numpy(board, mrv=False, limits=None, index=0):
+    '''Solve board with a TensorEngine and return a SolveResult (as
+       kropki_batch.solve_board does), or None if NumPy is missing'''
+    if np is None:
+        print("kropki_numpy needs NumPy (pip install numpy)")
+        return None
+    stime = time.process_time()
+    engine = TensorEngine(board)
+    stats = engine.solve(mrv, limits)
+    return SolveResult(index, engine.solution, stats.decisions, stats.prunings,
+                       time.process_time() - stime, stats)
@@ -0,0 +1,171 @@
+'''
+Parallel search for a single hard Kropki board.
+
+solve_parallel splits the search tree of one board at shallow depth:
+starting from the root it branches on variables (chosen by var_ord, as
+bt_search would) and propagates each branch, level by level, until there
+are enough open branches ("cubes") to keep every worker busy. Branches
+that fail propagation are dropped on the spot. Each cube is a partial
+assignment, and since the board's givens are exactly such an assignment
+a cube is handed out as a copy of the board with the cube's cells filled
+in. The cubes go to a process pool (see kropki_batch.solve_many) one at a
+time, so a worker that finishes an easy cube immediately takes the next
+one and the hard cubes spread over the pool. There are many more cubes
+than workers for the same reason.
+
+The first solution found ends the search (the pool is killed), and if
+every cube is proved to have no solution the board has none. As with
+bt_search, the result is a SolveResult whose stats are true iff a
+solution was found, false if there is none, and have status None if some
+cube hit its search limit first.
+'''
+
+import multiprocessing
+import time
+
+from cspbase import BT, SearchStats
+from kropki_csp import KropkiBoard, kropki_csp_model_1
+from kropki_batch import SolveResult, solve_many
+from propagators import prop_GAC, ord_mrv
+
+
+def solve_parallel(board, model=kropki_csp_model_1, propagator=prop_GAC,
+                   var_ord=ord_mrv, val_ord=None, extensional=False,
+                   jobs=None, cubes_per_job=8, max_depth=6, limits=None):
+    '''Solve board with jobs worker processes and return a SolveResult.
+
+       The tree is split until there are at least jobs * cubes_per_job
+       cubes or the cubes are max_depth decisions deep. limits (a
+       SearchLimits) applies to the search of each cube on its own.
+       The stats are summed over the split and every cube searched
+       (max_depth being the deepest search, split decisions included).'''
+    wtime = time.perf_counter()
+    stime = time.process_time()
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+
+    csp, variables = model(board, extensional=extensional)
+    bt = BT(csp)
+    bt.verbose_off()
+    cubes, solution = make_cubes(bt, propagator, var_ord, val_ord,
+                                 jobs * cubes_per_job, max_depth)
+    split_depth = len(cubes[0]) if cubes else bt.maxDepth
+    total = SearchStats(False, None, bt.nDecisions, bt.trail.nPrunings, 0, split_depth,
+                        bt.nPropagations, bt.propTime, 0, 0, dict())
+    bt.trail.undo(0)
+    bt.restore_all_variable_domains()
+    cpu_time = time.process_time() - stime
+
+    if solution is not None:
+        total.status = True
+        solution = [solution[i:i + board.dim] for i in range(0, len(solution), board.dim)]
+    else:
+        index = dict((v, i) for i, v in enumerate(variables))
+        cube_boards = [cube_board(board, index, cube) for cube in cubes]
+        results = solve_many(cube_boards, model, propagator, var_ord, val_ord, extensional,
+                             jobs=jobs, ordered=False, chunksize=1, limits=limits)
+        for r in results:
+            add_stats(total, r.stats, split_depth)
+            cpu_time += r.cpu_time
+            if r.solved:
+                solution = r.solution
+                total.status = True
+                total.limit = None
+                break
+            if r.stats.status is None:
+                total.status = None
+                total.limit = r.stats.limit
+        #stops the pool if we broke out early
+        results.close()
+
+    if solution is not None:
+        total.solution = dict((v, solution[i // board.dim][i % board.dim])
+                              for i, v in enumerate(variables))
+    total.search_time = time.perf_counter() - wtime
+    total.runtime = cpu_time
+    return SolveResult(0, solution, total.decisions, total.prunings, cpu_time, total)
+
+
+def make_cubes(bt, propagator, var_ord, val_ord, target, max_depth):
+    '''Split the search of bt's CSP breadth first into cubes, lists of
+       (variable, value) decisions that survive propagation, until there
+       are target of them or they are max_depth decisions long. Return
+       (cubes, solution), where solution is the list of values of the
+       CSP's variables if the split happened to find a solution (cubes
+       is then empty). No cubes and no solution means there is no
+       solution.
+
+       The counters of bt (decisions, propagations, trail prunings) are
+       left holding the cost of the split.'''
+    csp = bt.csp
+    trail = bt.trail
+    bt.restore_all_variable_domains()
+    trail.clear()
+    if not bt.propagate(propagator):
+        return [], None
+
+    cubes = [[]]
+    for depth in range(max_depth):
+        if len(cubes) >= target:
+            break
+        next_cubes = []
+        for cube in cubes:
+            mark = trail.mark()
+            for var, val in cube:
+                var.assign(val)
+                bt.propagate(propagator, var)
+            var = next_split_var(csp, var_ord)
+            if var is None:
+                #the cube assigns every variable: it is a solution
+                return [], [v.get_assigned_value() for v in csp.vars]
+            values = val_ord(csp, var) if val_ord else var.cur_domain()
+            for val in values:
+                branch = trail.mark()
+                var.assign(val)
+                bt.nDecisions += 1
+                bt.maxDepth = max(bt.maxDepth, depth + 1)
+                if bt.propagate(propagator, var):
+                    next_cubes.append(cube + [(var, val)])
+                trail.undo(branch)
+                var.unassign()
+            trail.undo(mark)
+            for var, val in reversed(cube):
+                var.unassign()
+        cubes = next_cubes
+        if not cubes:
+            break
+    return cubes, None
+
+
+def next_split_var(csp, var_ord):
+    '''The variable to split on next, or None if all are assigned'''
+    if var_ord:
+        return var_ord(csp)
+    for var in csp.vars:
+        if not var.is_assigned():
+            return var
+    return None
+
+
+def cube_board(board, index, cube):
+    '''Return a copy of board with the cells of the cube's decisions
+       given (index maps a variable to its cell number)'''
+    dim = board.dim
+    cell_values = [list(row) for row in board.cell_values]
+    for var, val in cube:
+        i = index[var]
+        cell_values[i // dim][i % dim] = val
+    return KropkiBoard(dim, cell_values, board.consec_row, board.consec_col,
+                       board.double_row, board.double_col)
+
+
+def add_stats(total, stats, split_depth):
+    '''Add the counters of stats (the search of one cube) to total'''
+    total.decisions += stats.decisions
+    total.prunings += stats.prunings
+    total.backtracks += stats.backtracks
+    total.max_depth = max(total.max_depth, split_depth + stats.max_depth)
+    total.propagations += stats.propagations
+    total.prop_time += stats.prop_time
+    for kind, n in stats.revisions.items():
+        total.revisions[kind] = total.revisions.get(kind, 0) + n
@@ -0,0 +1,160 @@
+'''
+Portfolio solving: race several solver configurations on one board.
+
+Which model, propagator and orderings solve a board fastest varies a lot
+from board to board. solve_portfolio starts one process per Config on
+the same KropkiBoard, takes the first definite answer (a solution, or a
+proof that there is none), kills the other processes and reports which
+configuration won. With a log file every race appends a JSON line, and
+winner_counts tallies the winners over a log, to help pick defaults.
+'''
+
+import json
+import multiprocessing
+import queue
+import time
+
+from kropki_csp import kropki_csp_model_1, kropki_csp_model_2
+from kropki_batch import solve_board
+from propagators import prop_FC, prop_GAC, ord_mrv, ord_dom_wdeg, val_random
+
+
+class Config:
+    '''One way of solving a board: a model builder, a propagator, a
+       variable ordering and a value ordering (None for the defaults),
+       and whether the model is extensional. The name identifies it in
+       results and logs.'''
+
+    def __init__(self, name, model=kropki_csp_model_1, propagator=prop_GAC,
+                 var_ord=ord_mrv, val_ord=None, extensional=False):
+        self.name = name
+        self.model = model
+        self.propagator = propagator
+        self.var_ord = var_ord
+        self.val_ord = val_ord
+        self.extensional = extensional
+
+    def solve(self, board, limits=None):
+        '''Solve board with this configuration and return a SolveResult'''
+        return solve_board(board, self.model, self.propagator, self.var_ord,
+                           self.val_ord, self.extensional, limits=limits)
+
+    def __repr__(self):
+        return "Config({})".format(self.name)
+
+
+DEFAULT_PORTFOLIO = [
+    Config('model_1/GAC/mrv'),
+    Config('model_2/GAC/mrv', kropki_csp_model_2),
+    Config('model_1/FC/default', propagator=prop_FC, var_ord=None),
+    Config('model_2/FC/mrv', kropki_csp_model_2, prop_FC),
+    Config('model_1/GAC/dom_wdeg', var_ord=ord_dom_wdeg),
+    Config('model_2/GAC/mrv/random1', kropki_csp_model_2, val_ord=val_random(1)),
+    Config('model_1/GAC/mrv/random2', val_ord=val_random(2)),
+    Config('model_2/GAC/dom_wdeg/random3', kropki_csp_model_2, var_ord=ord_dom_wdeg,
+           val_ord=val_random(3)),
+]
+
+
+class PortfolioResult:
+    '''The outcome of a race:
+       result   === the winner's SolveResult (the last one to finish if
+                    no configuration gave a definite answer)
+       winner   === the Config that gave the answer, or None if none did
+                    (every configuration hit its limits or failed)
+       wall     === wall clock seconds of the race
+       finished === names of the configurations that finished, in order
+    '''
+
+    def __init__(self, result, winner, wall, finished):
+        self.result = result
+        self.winner = winner
+        self.wall = wall
+        self.finished = finished
+
+    def __repr__(self):
+        return "PortfolioResult(winner={}, status={}, wall={:.3f})".format(
+            self.winner.name if self.winner else None,
+            self.result.stats.status if self.result else None, self.wall)
+
+
+def solve_portfolio(board, configs=None, limits=None, log=None):
+    '''Race configs (default DEFAULT_PORTFOLIO), each in its own process,
+       on board and return a PortfolioResult. limits (a SearchLimits)
+       applies to every configuration. If log is a file name, a JSON line
+       describing the race is appended to it.'''
+    if configs is None:
+        configs = DEFAULT_PORTFOLIO
+    start = time.perf_counter()
+    results = multiprocessing.Queue()
+    racers = [multiprocessing.Process(target=race, args=(board, config, i, limits, results),
+                                      daemon=True)
+              for i, config in enumerate(configs)]
+    for p in racers:
+        p.start()
+
+    winner = None
+    result = None
+    finished = []
+    while winner is None and len(finished) < len(racers):
+        try:
+            i, r = results.get(timeout=0.1)
+        except queue.Empty:
+            if not any(p.is_alive() for p in racers) and results.empty():
+                break   #the rest died without an answer
+            continue
+        finished.append(configs[i].name)
+        result = r
+        if r is not None and r.stats.status is not None:
+            winner = configs[i]
+
+    for p in racers:
+        if p.is_alive():
+            p.kill()
+    for p in racers:
+        p.join()
+    results.close()
+
+    outcome = PortfolioResult(result, winner, time.perf_counter() - start, finished)
+    if log is not None:
+        log_race(log, board, configs, outcome)
+    return outcome
+
+
+def race(board, config, index, limits, results):
+    '''Process body of one racer: solve and report (index, SolveResult),
+       or (index, None) if the configuration failed'''
+    try:
+        r = config.solve(board, limits)
+    except Exception as e:
+        print("Portfolio configuration {} failed: {}".format(config.name, e))
+        r = None
+    results.put((index, r))
+
+
+def log_race(path, board, configs, outcome):
+    '''Append one JSON line describing a race to the file path'''
+    r = outcome.result
+    entry = {'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+             'dim': board.dim,
+             'givens': sum(1 for row in board.cell_values for v in row if v > 0),
+             'configs': [c.name for c in configs],
+             'winner': outcome.winner.name if outcome.winner else None,
+             'status': r.stats.status if r else None,
+             'wall': outcome.wall,
+             'decisions': r.decisions if r else None,
+             'cpu_time': r.cpu_time if r else None}
+    with open(path, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def winner_counts(path):
+    '''Return a dict configuration name -> number of races it won in the
+       log file path'''
+    counts = dict()
+    with open(path) as f:
+        for line in f:
+            winner = json.loads(line).get('winner')
+            if winner is not None:
+                counts[winner] = counts.get(winner, 0) + 1
+    return counts
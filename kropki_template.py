@@ -0,0 +1,204 @@
+'''
+Precompiled Kropki models.
+
+Every puzzle of a given size has the same variables and the same row,
+column and sub-square constraints, and puzzles often share their dot
+layout too; only the givens differ. A ModelTemplate is a model built
+once for a (model, dim, dot layout, extensional) combination with every
+cell empty. For a board with that layout,
+
+    instantiate(board) makes a fresh model by creating the cell
+    variables (with the board's givens as single-value domains, as the
+    model builders do) and cloning the template's constraints onto them,
+    sharing their relations but not their search state.
+
+    reset(board) hands back the template's own model with just the cell
+    domains reset for board, which is what one-puzzle-at-a-time batch
+    solving wants.
+
+Either way the variables and constraints come in the same order as the
+model builder makes them, so search behaves exactly as on a freshly
+built model.
+
+TemplateCache keeps the most recently used templates in memory and can
+also save them to, and load them from, a directory of pickles.
+'''
+
+import collections
+import hashlib
+import os
+import pickle
+
+from cspbase import CSP, Variable, RELATIONS
+from kropki_csp import KropkiBoard
+
+
+class ModelTemplate:
+    '''A model compiled for one dot layout:
+       csp        === the template model (all cells empty to begin with)
+       variables  === its cell variables, in row-major order
+       scopes     === for each constraint of csp, the cell indices of its scope
+       var_cons   === for each cell, the positions in csp.cons of the
+                      constraints on it
+       groups     === the cell indices of each of csp.groups
+    '''
+
+    def __init__(self, model, board, extensional=False):
+        '''Build model (a model builder like kropki_csp_model_1) for
+           board's dot layout with every cell empty'''
+        empty = KropkiBoard(board.dim, [[-1] * board.dim for _ in range(board.dim)],
+                            board.consec_row, board.consec_col,
+                            board.double_row, board.double_col)
+        self.csp, self.variables = model(empty, extensional=extensional)
+        self.dim = board.dim
+        index = dict((v, i) for i, v in enumerate(self.variables))
+        cons = self.csp.get_all_cons()
+        self.scopes = [[index[v] for v in c.scope] for c in cons]
+        #vars_to_cons lists each variable's constraints in the order they
+        #were added, i.e. in csp.cons order
+        position = dict((c, k) for k, c in enumerate(cons))
+        self.var_cons = [[position[c] for c in self.csp.vars_to_cons[v]]
+                         for v in self.variables]
+        self.groups = [[index[v] for v in group] for group in self.csp.groups]
+
+    def domains(self, board):
+        '''Yield the domain of each cell of board, as the model builders
+           make them'''
+        dim = self.dim
+        domain = list(range(1, dim + 1))
+        for row in board.cell_values:
+            for value in row:
+                yield [value] if value > 0 else domain
+
+    def instantiate(self, board):
+        '''Return (csp, variables) for board, as the model builder would:
+           a new model whose constraints are clones of the template's'''
+        variables = [Variable(v.name, domain)
+                     for v, domain in zip(self.variables, self.domains(board))]
+        cons = [c.clone([variables[i] for i in scope])
+                for c, scope in zip(self.csp.cons, self.scopes)]
+        #fill in the CSP directly: the template was checked by
+        #add_var/add_constraint when it was built
+        csp = CSP(self.csp.name)
+        csp.vars = variables
+        csp.cons = cons
+        csp.vars_to_cons = dict((v, [cons[k] for k in ks])
+                                for v, ks in zip(variables, self.var_cons))
+        for group in self.groups:
+            csp.add_group([variables[i] for i in group])
+        return csp, variables
+
+    def reset(self, board):
+        '''Return the template's own (csp, variables), set up for board.
+           Only the cell domains are reset, so this costs next to nothing,
+           but whatever the template model was last set up for is gone
+           (use instantiate for models that must live side by side).
+           Constraint weights are reset by bt_search, and residues and
+           matchings are only search hints, so they are kept.'''
+        for var, domain in zip(self.variables, self.domains(board)):
+            var.reset_domain(domain)
+        self.csp.domain_buckets = None
+        return self.csp, self.variables
+
+    def __getstate__(self):
+        '''Pickle shared relations by their RELATIONS key as well, so
+           that loading hands them back to the registry (see
+           intern_relations)'''
+        state = self.__dict__.copy()
+        state['relation_keys'] = [RELATIONS.key_of(c.relation) if c.relation is not None else None
+                                  for c in self.csp.cons]
+        return state
+
+    def __setstate__(self, state):
+        keys = state.pop('relation_keys')
+        self.__dict__.update(state)
+        self.intern_relations(keys)
+
+    def intern_relations(self, keys):
+        '''Make the constraints use the registry's relation for each key
+           (registering the loaded one if the key is new)'''
+        for c, key in zip(self.csp.cons, keys):
+            if key is not None:
+                c.relation = RELATIONS.adopt(key, c.relation)
+
+
+def template_key(model, board, extensional=False):
+    '''The key of the template for model, board's dot layout and extensional'''
+    layout = tuple(tuple(tuple(row) for row in dots) for dots in
+                   (board.consec_row, board.consec_col, board.double_row, board.double_col))
+    return (model.__name__, board.dim, extensional, layout)
+
+
+class TemplateCache:
+    '''LRU cache of ModelTemplates holding at most maxsize of them. If
+       path (a directory) is given, templates missing from memory are
+       looked for there before being compiled, and newly compiled
+       templates are saved there.'''
+
+    def __init__(self, maxsize=64, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.templates = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def get(self, model, board, extensional=False):
+        '''Return the template of model for board's dot layout'''
+        key = template_key(model, board, extensional)
+        template = self.templates.get(key)
+        if template is not None:
+            self.hits += 1
+            self.templates.move_to_end(key)
+            return template
+        self.misses += 1
+        template = self.load(key)
+        if template is None:
+            template = ModelTemplate(model, board, extensional)
+            self.save(key, template)
+        self.templates[key] = template
+        if len(self.templates) > self.maxsize:
+            self.templates.popitem(last=False)
+        return template
+
+    def model(self, model, board, extensional=False, reuse=False):
+        '''Drop-in for model(board, extensional): return (csp, variables)
+           instantiated from the cached template, or, if reuse, the
+           template's own model reset for board (see ModelTemplate.reset)'''
+        template = self.get(model, board, extensional)
+        if reuse:
+            return template.reset(board)
+        return template.instantiate(board)
+
+    def file_name(self, key):
+        return os.path.join(self.path, hashlib.sha1(repr(key).encode()).hexdigest() + '.pickle')
+
+    def load(self, key):
+        '''Return the template saved under key, or None'''
+        if self.path is None:
+            return None
+        try:
+            with open(self.file_name(key), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print("Warning: ignoring unreadable template file ({})".format(e))
+            return None
+
+    def save(self, key, template):
+        if self.path is None:
+            return
+        #write then rename, so concurrent readers never see half a file
+        name = self.file_name(key)
+        tmp = '{}.{}.tmp'.format(name, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(template, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, name)
+
+    def clear(self):
+        self.templates.clear()
+
+    def __len__(self):
+        return len(self.templates)
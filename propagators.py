@@ -1,6 +1,12 @@
 # Look for #IMPLEMENT tags in this file. These tags indicate what has
 # to be implemented.
-import queue
+import collections
+import functools
+import itertools
+import random
+import weakref
+
+from cspbase import Constraint, Trail
 
 '''
 This file will contain different constraint propagators to be used within
@@ -60,63 +66,87 @@ propagator == a function with the following template
 
             for gac we initialize the GAC queue with all constraints containing
             V.
+
+TRAIL-BASED PROPAGATORS
+    The propagators below are written against a Trail (see cspbase.py)
+    and wrapped with @trail_propagator, which gives them the signature
+
+        propagator(csp, newly_instantiated_variable=None, trail=None)
+
+    When bt_search supplies its trail the removals are pushed onto it
+    (trail.prune(var, val)) and the returned pruning list is empty, so no
+    per-call list is built. Called without a trail they keep the
+    contract above and return (True/False, [(Variable, Value), ...]).
+
+    prop_FC and prop_GAC filter a constraint with its revise(trail)
+    method, so a constraint with a dedicated algorithm (e.g. the
+    matching-based AllDifferent of cspbase.py) is used directly.
+    prop_CT is prop_GAC with table constraints filtered by Compact-Table
+    (reversible bitsets of valid tuples) instead of support scans.
+
+    Before filtering a constraint (or group) they set trail.culprit to
+    its scope: what an ExplainingTrail blames for the prunings and for
+    a dead end (see bt_search(..., cbj=True)). BT resets it to None
+    (blame every decision: safe, but it backjumps less) before each
+    propagator call, so a propagator that never sets it is fine; one
+    that prunes by itself after calling these must set it again.
 '''
 
 
-def prop_BT(csp, newVar=None):
+def trail_propagator(prop):
+    '''Turn prop(csp, newVar, trail) ==> True/False into a propagator
+       that follows the (status, prunings) contract and also accepts
+       the search trail (see TRAIL-BASED PROPAGATORS above)'''
+    @functools.wraps(prop)
+    def propagator(csp, newVar=None, trail=None):
+        if trail is not None:
+            return prop(csp, newVar, trail), []
+        trail = Trail()
+        status = prop(csp, newVar, trail)
+        return status, trail.prunings_since(0)
+    propagator.uses_trail = True
+    return propagator
+
+
+@trail_propagator
+def prop_BT(csp, newVar, trail):
     '''Do plain backtracking propagation. That is, do no 
     propagation at all. Just check fully instantiated constraints'''
     if not newVar:
-        return True, []
+        return True
     for c in csp.get_cons_with_var(newVar):
         if c.get_n_unasgn() == 0:
+            c.revisions += 1
             vals = []
             vars = c.get_scope()
             for var in vars:
                 vals.append(var.get_assigned_value())
             if not c.check(vals):
-                return False, []
-    return True, []
+                c.weight += 1
+                trail.culprit = vars
+                return False
+    return True
 
 
-def prop_FC(csp, newVar=None):
+@trail_propagator
+def prop_FC(csp, newVar, trail):
     '''Do forward checking. That is check constraints with 
        only one uninstantiated variable. Remember to keep 
        track of all pruned variable,value pairs and return '''
     # IMPLEMENT
-    restore_lst = []
-
     if newVar is not None:
         all_constraints = csp.get_cons_with_var(newVar)
     else:
         all_constraints = csp.get_all_cons()
 
     for c in all_constraints:
+        c.revisions += 1
+        trail.culprit = c.scope
+        if c.revise(trail) is None:
+            c.weight += 1
+            return False
 
-        # restore_lst = []
-        # num = c.get_n_unasgn()
-        # if num == 1:
-        #     variable_in_list = c.get_unasgn_vars()
-        #     variable = variable_in_list[0]
-        for variable in c.get_unasgn_vars():
-            for value in variable.cur_domain():
-                if not c.has_support(variable, value):
-                    variable.prune_value(value)
-                    restore_lst.append((variable, value))
-                    # print("before",variable.cur_domain())
-                    # status, pruned = FCCheck(c, variable)
-                    # print("after", variable.cur_domain())
-                    if len(variable.cur_domain()) == 0:
-                        return False, restore_lst
-            # for v in pruned:
-            #     restore_lst.append(v)
-            # if status:
-            #     return False, restore_lst
-
-    # print(restore_lst)
-    # if flag:
-    #     return False, restore_lst
-    return True, restore_lst
+    return True
 
 
 # def FCCheck(c, x):
@@ -135,71 +165,551 @@ def prop_FC(csp, newVar=None):
 #     return False, pruned_value
 
 
-GACQueue = queue.Queue()
-
-
-def prop_GAC(csp, newVar=None):
+@trail_propagator
+def prop_GAC(csp, newVar, trail):
     '''Do GAC propagation. If newVar is None we do initial GAC enforce
        processing all constraints. Otherwise we do GAC enforce with
        constraints containing newVar on GAC Queue'''
     # IMPLEMENT
     # Follow the pseudocode example from lec slides.
-    prund_lst = []
     if newVar is not None:
         all_constraints = csp.get_cons_with_var(newVar)
     else:
         all_constraints = csp.get_all_cons()
+    return GAC_enforce(csp, all_constraints, trail)
+
+
+def GAC_enforce(csp, all_constraints, trail, revise=None):
+    '''Run the GAC queue starting from all_constraints until no domain
+       changes. Each constraint is filtered with revise(c, trail) if
+       given, else with c.revise(trail). Return False on a DWO.
+
+       The queue is local to the call (a deque plus a set of the queued
+       constraints for O(1) duplicate checks), so there is no shared
+       state between calls, solvers or threads, and nothing is left
+       behind when we return early on a DWO.'''
+    gac_queue = collections.deque(all_constraints)
+    # check set only holds unique constraints: a queued constraint is not queued again.
+    check_set = set(gac_queue)
+    vars_to_cons = csp.vars_to_cons
+
+    while gac_queue:
+        constraints = gac_queue.popleft()
+        check_set.discard(constraints)
+        constraints.revisions += 1
+        trail.culprit = constraints.scope
+        if revise is None:
+            changed = constraints.revise(trail)
+        else:
+            changed = revise(constraints, trail)
+        # DWO occurred
+        if changed is None:
+            constraints.weight += 1
+            return False
+        for variable in changed:
+            # keep finding other constraints with current variable.
+            for item in vars_to_cons[variable]:
+                if item not in check_set:
+                    check_set.add(item)
+                    gac_queue.append(item)
+    return True
+
+
+@trail_propagator
+def prop_GAC_arc(csp, newVar, trail):
+    '''Do GAC propagation like prop_GAC, but with an arc-oriented queue:
+       the items are (variable, constraint) pairs and revising one only
+       checks the supports of that variable's values in that constraint'''
+    if newVar is not None:
+        all_constraints = csp.get_cons_with_var(newVar)
+    else:
+        all_constraints = csp.get_all_cons()
+    return GAC_enforce_arcs(csp, all_constraints, trail)
 
-    check_lst = make_Queue_and_check_list(all_constraints)
-
-    while not GACQueue.empty():
-        constraints = GACQueue.get()
-        if constraints in check_lst:
-            # check lst only check for unique constraints. No duplicate constraints in check lst.
-            check_lst.remove(constraints)
-        for variable in constraints.get_unasgn_vars():
-            for value in variable.cur_domain():
-                if not constraints.has_support(variable, value):
-                    variable.prune_value(value)
-                    prund_lst.append((variable, value))
-
-                    # DWO occurred
-                    if len(variable.cur_domain()) == 0:
-                        return False, prund_lst
-                    # deep first search, keep finding other constraints with current variable.
-                    new_constraints = csp.get_cons_with_var(variable)
-                    for item in new_constraints:
-                        # avoid duplicates
-                        if item not in check_lst:
-                            # update check lst and Queue.
-                            check_lst.append(item)
-                            GACQueue.put(item)
-    # print("okay", prund_lst)
-    return True, prund_lst
-
-
-def make_Queue_and_check_list(cons: list):
-    """ Make a list copy of all constraints. Also, put all constraints into the Queue.
-    And Return the copy list for further checking and updating"""
-    check_lst = []
-    for item in cons:
-        check_lst.append(item)
-        GACQueue.put(item)
-    return check_lst
+
+def GAC_enforce_arcs(csp, all_constraints, trail):
+    '''Arc-oriented version of GAC_enforce (AC-3 over (variable,
+       constraint) arcs). When a variable loses values every arc
+       (z, c) with z another unassigned variable of a constraint c on
+       that variable is queued again'''
+    arc_queue = collections.deque()
+    check_set = set()
+    for c in all_constraints:
+        for var in c.scope:
+            if not var.is_assigned() and (var, c) not in check_set:
+                check_set.add((var, c))
+                arc_queue.append((var, c))
+    vars_to_cons = csp.vars_to_cons
+
+    while arc_queue:
+        arc = arc_queue.popleft()
+        check_set.discard(arc)
+        var, c = arc
+        if var.is_assigned():
+            continue
+        c.revisions += 1
+        trail.culprit = c.scope
+        pruned = False
+        for val in var.cur_domain():
+            if not c.has_support(var, val):
+                trail.prune(var, val)
+                pruned = True
+        if not pruned:
+            continue
+        if var.cur_domain_size() == 0:
+            c.weight += 1
+            return False
+        for item in vars_to_cons[var]:
+            for z in item.scope:
+                if z is not var and not z.is_assigned() and (z, item) not in check_set:
+                    check_set.add((z, item))
+                    arc_queue.append((z, item))
+    return True
+
+
+@trail_propagator
+def prop_CT(csp, newVar, trail):
+    '''Do GAC propagation like prop_GAC, but filter table constraints
+       (plain Constraints holding sat_tuples) with Compact-Table. Other
+       constraints use their own revise method'''
+    if newVar is not None:
+        all_constraints = csp.get_cons_with_var(newVar)
+    else:
+        all_constraints = csp.get_all_cons()
+    return GAC_enforce(csp, all_constraints, trail, CT_revise)
+
+
+def CT_revise(c, trail):
+    '''Filter c with its CompactTable if c is a table constraint'''
+    if type(c).revise is not Constraint.revise or c.relation is None:
+        return c.revise(trail)
+    ct = CTStates.get(c)
+    if ct is None:
+        ct = CTStates[c] = CompactTable(c)
+    return ct.revise(trail)
+
+
+class CompactTable:
+    '''Compact-Table state of one table constraint.
+
+       The tuples of the constraint's relation are numbered, and the
+       state keeps 'table', a bitset (a Python int) of the tuples that
+       are still valid, plus the domain mask of every scope variable
+       when the table was last brought up to date. Each (position,
+       value) has a precomputed support mask of the tuples with that
+       value there (shared by all constraints over the relation). A
+       domain change is applied with one AND per position, and a value
+       keeps its support iff its mask still meets the table.
+
+       The state is reversible: before changing it the old (table,
+       masks) pair is pushed on the trail, whose undo hands it back to
+       trail_undo.'''
+
+    def __init__(self, c):
+        self.scope = c.scope
+        self.masks = support_masks(c.relation)
+        #empty masks: the first revise sees every domain as grown and
+        #builds the table from scratch
+        self.table = 0
+        self.last = [0] * len(self.scope)
+
+    def trail_undo(self, saved):
+        self.table, self.last = saved
+
+    def revise(self, trail):
+        '''Bring the table up to date with the current domains and prune
+           the values left without support. Same result as
+           Constraint.revise'''
+        table = self.table
+        last = list(self.last)
+        masks = self.masks
+        for pos, var in enumerate(self.scope):
+            cur = var.cur_domain_mask()
+            old = last[pos]
+            if cur == old:
+                continue
+            if cur & ~old:
+                #a domain grew without the state being restored (first
+                #call, or the state was changed through a throw-away
+                #trail): rebuild the table
+                table = self.full_table()
+                last = [v.cur_domain_mask() for v in self.scope]
+                break
+            last[pos] = cur
+            removed = old & ~cur
+            pmasks = masks[pos]
+            if removed.bit_count() < cur.bit_count():
+                for val in var.mask_values(removed):
+                    table &= ~pmasks.get(val, 0)
+            else:
+                keep = 0
+                for val in var.mask_values(cur):
+                    keep |= pmasks.get(val, 0)
+                table &= keep
+        if table == 0:
+            return None
+
+        changed = []
+        for pos, var in enumerate(self.scope):
+            if var.is_assigned():
+                continue
+            pmasks = masks[pos]
+            pruned = False
+            for val in var.cur_domain():
+                if not pmasks.get(val, 0) & table:
+                    trail.prune(var, val)
+                    pruned = True
+            if pruned:
+                if var.cur_domain_size() == 0:
+                    return None
+                last[pos] = var.curmask
+                changed.append(var)
+        if table != self.table or last != self.last:
+            trail.push(self, (self.table, self.last))
+            self.table = table
+            self.last = last
+        return changed
+
+    def full_table(self):
+        '''The bitset of tuples valid in the current domains'''
+        table = -1
+        for pos, var in enumerate(self.scope):
+            keep = 0
+            for val in var.cur_domain():
+                keep |= self.masks[pos].get(val, 0)
+            table &= keep
+        return table
+
+
+def support_masks(relation):
+    '''Return, for each position of relation, a dict value -> bitset of
+       the (numbered) tuples with that value at that position. Cached
+       per relation'''
+    cached = SupportMasks.get(relation)
+    if cached is not None and cached[0] == len(relation):
+        return cached[1]
+    nbytes = (len(relation) >> 3) + 1
+    bits = [dict() for _ in relation.supports]
+    for k, t in enumerate(relation.tuples):
+        byte = k >> 3
+        bit = 1 << (k & 7)
+        for pos, val in enumerate(t):
+            arr = bits[pos].get(val)
+            if arr is None:
+                arr = bits[pos][val] = bytearray(nbytes)
+            arr[byte] |= bit
+    masks = [dict((val, int.from_bytes(arr, 'little')) for val, arr in b.items())
+             for b in bits]
+    SupportMasks[relation] = (len(relation), masks)
+    return masks
+
+
+#Compact-Table bookkeeping: support masks per Relation and CompactTable
+#state per Constraint (dropped along with them)
+SupportMasks = weakref.WeakKeyDictionary()
+CTStates = weakref.WeakKeyDictionary()
+
+
+#Sudoku rules: propagators over csp.groups, the lists of variables that
+#take all different values (the models record rows, columns and sub
+#squares). Each works on the groups' candidates as value bitmasks (bit v
+#<=> value v is possible) and prunes through the trail like the others:
+#    prop_hidden_singles === a value with one place left in a group goes there
+#    prop_naked_subsets  === k cells of a group with only k candidates between
+#                            them take those values: the rest of the group
+#                            cannot (naked pairs and triples)
+#    prop_hidden_subsets === k values with only k places left in a group
+#                            fill those cells: the cells lose their other
+#                            candidates (hidden singles, pairs and triples)
+#They filter only; combine them with a propagator that handles the
+#constraints (see compose and prop_GAC_rules).
+
+SUBSET_SIZE = 3     #largest naked/hidden subsets looked for
+
+
+def value_mask(var):
+    '''The current domain of var as a bitmask over values'''
+    mask = 0
+    for v in var.cur_domain():
+        mask |= 1 << v
+    return mask
+
+
+def mask_bits(mask):
+    '''The values (bit positions) set in mask'''
+    vals = []
+    while mask:
+        low = mask & -mask
+        vals.append(low.bit_length() - 1)
+        mask ^= low
+    return vals
+
+
+def remove_values(var, mask, trail):
+    '''Prune the values of mask from var. Return False if that empties
+       var's domain (or would remove an assigned variable's value)'''
+    if var.is_assigned():
+        return not mask & (1 << var.get_assigned_value())
+    for v in var.cur_domain():
+        if mask & (1 << v):
+            trail.prune(var, v)
+    return var.cur_domain_size() > 0
+
+
+def group_positions(masks):
+    '''For the value masks of a group's cells, return dict value -> the
+       bitmask of the cells (by position in the group) that can take it'''
+    positions = collections.defaultdict(int)
+    for i, m in enumerate(masks):
+        for v in mask_bits(m):
+            positions[v] |= 1 << i
+    return positions
+
+
+def hidden_subsets(group, trail, size=SUBSET_SIZE):
+    '''Apply hidden subsets of 1 (hidden singles) to size values to
+       group. Return False on a dead end'''
+    trail.culprit = group
+    masks = [value_mask(var) for var in group]
+    positions = group_positions(masks)
+    if len(positions) < len(group):
+        return False    #a value has no place left
+    values = [v for v, p in positions.items() if p.bit_count() <= size]
+    for k in range(1, size + 1):
+        for subset in itertools.combinations(values, k):
+            cells = 0
+            for v in subset:
+                cells |= positions[v]
+            n = cells.bit_count()
+            if n < k:
+                return False
+            if n > k:
+                continue
+            keep = 0
+            for v in subset:
+                keep |= 1 << v
+            for i in mask_bits(cells):
+                if masks[i] & ~keep:
+                    if not remove_values(group[i], masks[i] & ~keep, trail):
+                        return False
+                    masks[i] &= keep
+    return True
+
+
+def naked_subsets(group, trail, size=SUBSET_SIZE):
+    '''Apply naked subsets of 2 to size cells to group. Return False on
+       a dead end'''
+    trail.culprit = group
+    masks = [value_mask(var) for var in group]
+    cells = [i for i, m in enumerate(masks) if 1 < m.bit_count() <= size]
+    for k in range(2, size + 1):
+        for subset in itertools.combinations(cells, k):
+            values = 0
+            for i in subset:
+                values |= masks[i]
+            n = values.bit_count()
+            if n < k:
+                return False
+            if n > k:
+                continue
+            for i, var in enumerate(group):
+                if i not in subset and masks[i] & values:
+                    if not remove_values(var, masks[i] & values, trail):
+                        return False
+                    masks[i] &= ~values
+    return True
+
+
+@trail_propagator
+def prop_hidden_singles(csp, newVar, trail):
+    '''Place every value that has one cell left in a group'''
+    for group in csp.groups:
+        if not hidden_subsets(group, trail, 1):
+            return False
+    return True
+
+
+@trail_propagator
+def prop_naked_subsets(csp, newVar, trail):
+    '''Naked pairs and triples over every group'''
+    for group in csp.groups:
+        if not naked_subsets(group, trail):
+            return False
+    return True
+
+
+@trail_propagator
+def prop_hidden_subsets(csp, newVar, trail):
+    '''Hidden singles, pairs and triples over every group'''
+    for group in csp.groups:
+        if not hidden_subsets(group, trail):
+            return False
+    return True
+
+
+#the rule for one group, so that propagate_with_rules can apply a rule
+#to just the groups where something changed
+prop_hidden_singles.group_rule = functools.partial(hidden_subsets, size=1)
+prop_naked_subsets.group_rule = naked_subsets
+prop_hidden_subsets.group_rule = hidden_subsets
+
+#prop_hidden_subsets includes the hidden singles, so prop_hidden_singles
+#(cheaper alone) is not repeated here
+SUDOKU_RULES = (prop_naked_subsets, prop_hidden_subsets)
+
+
+def run_propagator(prop, csp, var, trail):
+    '''Call prop (trail-based or not) after var changed, recording its
+       prunings on trail. Return its status'''
+    trail.culprit = None
+    if getattr(prop, 'uses_trail', False):
+        return prop(csp, var, trail)[0]
+    status, prunings = prop(csp, var)
+    trail.record(prunings)
+    return status
+
+
+def propagate_with_rules(csp, newVar, trail, propagator, rules):
+    '''Run propagator, then the rules, in turn until none of them prunes
+       anything. After the rules prune, propagator is run again once for
+       every variable that lost values (as if it had just been assigned).
+       At the root the rules sweep every group; after that a rule with a
+       group_rule is only applied to the groups of the variables that
+       changed since it last ran.'''
+    mark = trail.mark()
+    if not run_propagator(propagator, csp, newVar, trail):
+        return False
+    dirty = None
+    if newVar is not None:
+        dirty = changed_groups(csp, trail, mark, newVar)
+    while True:
+        mark = trail.mark()
+        for rule in rules:
+            group_rule = getattr(rule, 'group_rule', None)
+            if dirty is None or group_rule is None:
+                if not run_propagator(rule, csp, newVar, trail):
+                    return False
+                continue
+            for g in sorted(dirty):
+                if not group_rule(csp.groups[g], trail):
+                    return False
+        #in pruning order, so that the search is repeatable
+        changed = dict.fromkeys(var for var, _ in trail.prunings_since(mark))
+        if not changed:
+            return True
+        for var in changed:
+            if not run_propagator(propagator, csp, var, trail):
+                return False
+        dirty = changed_groups(csp, trail, mark)
+
+
+def changed_groups(csp, trail, mark, var=None):
+    '''The indices in csp.groups of the groups of var and of every
+       variable pruned since mark'''
+    var_groups = csp.var_groups
+    dirty = set(var_groups.get(var, ()))
+    for v, _ in trail.prunings_since(mark):
+        dirty.update(var_groups.get(v, ()))
+    return dirty
+
+
+def compose(propagator, *rules):
+    '''Return a propagator that runs propagator and rules to a common
+       fixpoint (see propagate_with_rules), e.g.
+       compose(prop_FC, prop_hidden_singles). Being made on the fly it
+       cannot be sent to worker processes; prop_FC_rules and
+       prop_GAC_rules can.'''
+    @trail_propagator
+    def composed(csp, newVar, trail):
+        return propagate_with_rules(csp, newVar, trail, propagator, rules)
+    return composed
+
+
+@trail_propagator
+def prop_FC_rules(csp, newVar, trail):
+    '''prop_FC plus every Sudoku rule'''
+    return propagate_with_rules(csp, newVar, trail, prop_FC, SUDOKU_RULES)
+
+
+@trail_propagator
+def prop_GAC_rules(csp, newVar, trail):
+    '''prop_GAC plus every Sudoku rule'''
+    return propagate_with_rules(csp, newVar, trail, prop_GAC, SUDOKU_RULES)
 
 
 def ord_mrv(csp):
     ''' return variable according to the Minimum Remaining Values heuristic '''
-    # IMPLEMENT
-    all_variables = csp.get_all_vars()
-    dict = {}
-    for variable in all_variables:
-        if not variable.is_assigned():
-            count = len(variable.cur_domain())
-            dict[variable] = count
-    for key in dict.keys():
-        if dict[key] == min(dict.values()):
-            # print(key)
-            return key
-
-    return None
+    # The CSP's DomainBuckets track every domain size incrementally, so the
+    # pick only looks at the variables of smallest domain (ties go to the
+    # lowest index, whatever order the search pruned them in).
+    return csp.get_domain_buckets().min_var()
+
+
+def ord_dom_deg(csp):
+    ''' return variable according to MRV, breaking ties by the largest
+        dynamic degree (number of constraints shared with other unassigned
+        variables), then by the lowest index '''
+    buckets = csp.get_domain_buckets()
+    bucket = buckets.min_bucket()
+    if not bucket:
+        return None
+    if len(bucket) == 1:
+        return next(iter(bucket))
+    index = buckets.index
+    return max(bucket, key=lambda var: (dynamic_degree(csp, var), -index[var]))
+
+
+def ord_dom_wdeg(csp):
+    ''' return the unassigned variable with the smallest ratio of current
+        domain size to weighted degree, where a constraint weighs 1 plus the
+        number of domain wipe-outs it has caused in this search (ties go
+        to the lowest index) '''
+    best = None
+    best_ratio = None
+    buckets = csp.get_domain_buckets()
+    index = buckets.index
+    for bucket in buckets.buckets:
+        for var in bucket:
+            ratio = (var.cur_domain_size() / dynamic_degree(csp, var, True), index[var])
+            if best is None or ratio < best_ratio:
+                best = var
+                best_ratio = ratio
+    return best
+
+
+def dynamic_degree(csp, var, weighted=False):
+    ''' return the number (or total weight) of the constraints on var that
+        have another unassigned variable, counting at least 1 '''
+    deg = 0
+    for c in csp.vars_to_cons[var]:
+        for z in c.scope:
+            if z is not var and not z.is_assigned():
+                deg += c.weight if weighted else 1
+                break
+    return deg or 1
+
+
+class val_random:
+    ''' value ordering that tries the current domain of a variable in a
+        random order. The order is drawn from a generator seeded with seed,
+        and BT reseeds it (reset) at the start of every search, so a search
+        with the same seed makes the same choices, even with an instance
+        reused across searches; a portfolio of searches with different
+        seeds explores the tree differently. (A class rather than a
+        function so that it can be sent to worker processes.) '''
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.reset()
+
+    def reset(self):
+        '''Start the sequence of orders of seed over'''
+        self.rnd = random.Random(self.seed)
+
+    def __call__(self, csp, var):
+        values = var.cur_domain()
+        self.rnd.shuffle(values)
+        return values
+
+    def __repr__(self):
+        return "val_random({})".format(self.seed)
@@ -0,0 +1,177 @@
+'''
+Self-checks for the propagation and search algorithms, on a few fixed
+boards of kropki_bench_corpus.txt. Run with
+
+    python -m unittest test_kropki
+'''
+
+import itertools
+import random
+import unittest
+
+from cspbase import BT, Trail, Variable, AllDifferent, NogoodStore
+from kropki_bench import read_corpus
+from kropki_csp import kropki_csp_model_1, kropki_csp_model_2
+from kropki_io import parse_board
+from propagators import prop_FC, prop_GAC, prop_CT, prop_GAC_arc, ord_mrv
+
+#6x6 and 9x9 boards: the 6x6 ones and 9x9-minimal-1 have one solution,
+#9x9-hard-1 has 48 and 9x9-hard-3 1167
+BOARDS = ('6x6-hard-1', '6x6-minimal-2', '9x9-hard-1', '9x9-hard-3', '9x9-minimal-1')
+#the boards whose solutions are few enough to enumerate
+FEW_SOLUTIONS = ('6x6-hard-1', '6x6-minimal-2', '9x9-hard-1', '9x9-minimal-1')
+#9x9-minimal-1 with a wrong given: no solution, but forward checking
+#only finds that out after some 1700 decisions
+UNSAT = ('9:5................................................................................'
+         ':002302000001000020101030001100101010110320000002100300200010000000200000'
+         ':010001010120120300000002001000010200000121020011000000101000021100020010')
+
+
+def corpus_boards(names=BOARDS):
+    '''Return the KropkiBoards of the corpus puzzles called names'''
+    lines = dict((p['name'], p['line']) for p in read_corpus())
+    return [(name, parse_board(lines[name])) for name in names]
+
+
+def solve(model, board, propagator, var_ord=None, extensional=False, **options):
+    '''Return the SearchStats and solution (list of values) of a silent
+       bt_search of model on board'''
+    csp, variables = model(board, extensional=extensional)
+    bt = BT(csp)
+    bt.verbose_off()
+    stats = bt.bt_search(propagator, var_ord, **options)
+    return stats, [v.get_assigned_value() for v in variables]
+
+
+def all_solutions(model, board, propagator, var_ord=None):
+    '''Return the sorted list of every solution of model on board'''
+    csp, variables = model(board)
+    bt = BT(csp)
+    return sorted(tuple(solution[v] for v in variables)
+                  for solution in bt.iter_solutions(propagator, var_ord))
+
+
+def gac_domains(domains):
+    '''Brute force GAC of AllDifferent over domains (lists of values):
+       the values of each position that appear in some all-different
+       tuple, or None if there is none'''
+    keep = [set() for _ in domains]
+    for t in itertools.product(*domains):
+        if len(set(t)) == len(t):
+            for s, v in zip(keep, t):
+                s.add(v)
+    if not keep[0]:
+        return None
+    return [sorted(s) for s in keep]
+
+
+class TestAllDifferent(unittest.TestCase):
+
+    def test_revise_is_gac(self):
+        '''Regin's filtering keeps exactly the supported values'''
+        rnd = random.Random(0)
+        for _ in range(300):
+            n = rnd.randint(2, 6)
+            domains = [sorted(rnd.sample(range(1, 7), rnd.randint(1, 4))) for _ in range(n)]
+            variables = [Variable('V{}'.format(i), d) for i, d in enumerate(domains)]
+            c = AllDifferent('C', variables)
+            trail = Trail()
+            changed = c.revise(trail)
+            expected = gac_domains(domains)
+            if expected is None:
+                self.assertIsNone(changed, domains)
+                continue
+            self.assertIsNotNone(changed, domains)
+            self.assertEqual([v.cur_domain() for v in variables], expected, domains)
+            trail.undo(0)
+            self.assertEqual([v.cur_domain() for v in variables], domains)
+
+    def test_same_as_pairwise(self):
+        '''model_2 (AllDifferent) and model_1 (pairwise NotEqual) have the
+           same solutions, and model_2 prunes at least as much'''
+        for name, board in corpus_boards(FEW_SOLUTIONS):
+            self.assertEqual(all_solutions(kropki_csp_model_2, board, prop_GAC, ord_mrv),
+                             all_solutions(kropki_csp_model_1, board, prop_GAC, ord_mrv), name)
+        for name, board in corpus_boards():
+            regin, _ = solve(kropki_csp_model_2, board, prop_GAC)
+            pairwise, _ = solve(kropki_csp_model_1, board, prop_GAC)
+            self.assertTrue(regin, name)
+            self.assertLessEqual(regin.decisions, pairwise.decisions, name)
+
+
+class TestGACPropagators(unittest.TestCase):
+
+    def test_same_search(self):
+        '''prop_GAC, prop_CT (Compact-Table on the table constraints) and
+           prop_GAC_arc all enforce GAC, so they search the same tree'''
+        for name, board in corpus_boards():
+            for model, extensional in ((kropki_csp_model_1, False), (kropki_csp_model_1, True),
+                                       (kropki_csp_model_2, False), (kropki_csp_model_2, True)):
+                if model is kropki_csp_model_2 and extensional and board.dim > 6:
+                    continue    #9! tuples per AllDifferent table: slow to build
+                #static order on the 6x6 boards only, to keep the test short
+                for var_ord in ((None, ord_mrv) if board.dim == 6 else (ord_mrv,)):
+                    runs = [solve(model, board, propagator, var_ord, extensional)
+                            for propagator in (prop_GAC, prop_CT, prop_GAC_arc)]
+                    expected = runs[0]
+                    for stats, solution in runs[1:]:
+                        what = (name, model.__name__, extensional, var_ord)
+                        self.assertEqual(solution, expected[1], what)
+                        self.assertEqual(stats.decisions, expected[0].decisions, what)
+                        self.assertEqual(stats.backtracks, expected[0].backtracks, what)
+
+
+class TestBackjumping(unittest.TestCase):
+
+    def check_same_search(self, name, board, model, propagator, var_ord):
+        '''Backjumping, with and without nogoods, finds plain search's first
+           solution (or lack of one) in no more decisions'''
+        plain, expected = solve(model, board, propagator, var_ord)
+        for nogoods in (None, NogoodStore(100, 8)):
+            stats, solution = solve(model, board, propagator, var_ord,
+                                    cbj=True, nogoods=nogoods)
+            what = (name, propagator.__name__, var_ord, nogoods is not None)
+            self.assertEqual(stats.status, plain.status, what)
+            self.assertEqual(solution, expected, what)
+            self.assertLessEqual(stats.decisions, plain.decisions, what)
+
+    def test_first_solution(self):
+        for name, board in corpus_boards():
+            for propagator in (prop_FC, prop_GAC):
+                for var_ord in (None, ord_mrv):
+                    if propagator is prop_FC and var_ord is None and board.dim > 6:
+                        continue    #far too many decisions
+                    self.check_same_search(name, board, kropki_csp_model_1, propagator, var_ord)
+
+    def test_no_solution(self):
+        board = parse_board(UNSAT)
+        for var_ord in (None, ord_mrv):
+            self.check_same_search('unsat', board, kropki_csp_model_1, prop_FC, var_ord)
+        stats, _ = solve(kropki_csp_model_1, board, prop_FC, cbj=True)
+        self.assertGreater(stats.backjumps, 0)
+
+    def test_enumeration(self):
+        '''search_solutions_cbj yields the solutions of search_solutions,
+           in the same order'''
+        for name, board in corpus_boards(('6x6-hard-1', '9x9-hard-1')):
+            found = []
+            for cbj in (False, True):
+                csp, variables = kropki_csp_model_1(board)
+                bt = BT(csp)
+                bt.verbose_off()
+                solutions = []
+                if bt.start_search(prop_GAC, report=False, explain=cbj):
+                    if cbj:
+                        search = bt.search_solutions_cbj(prop_GAC, ord_mrv, None)
+                    else:
+                        search = bt.search_solutions(prop_GAC, ord_mrv, None)
+                    for _ in search:
+                        solutions.append([v.get_assigned_value() for v in variables])
+                bt.finish_search(bool(solutions), False, False)
+                found.append(solutions)
+            self.assertEqual(found[0], found[1], name)
+            self.assertEqual(len(found[0]), 1 if name == '6x6-hard-1' else 48)
+
+
+if __name__ == '__main__':
+    unittest.main()